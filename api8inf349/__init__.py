@@ -1,14 +1,36 @@
 from flask import Flask
 from flask_cors import CORS
 
-from api8inf349.commands import init_db_command
+from api8inf349.commands import (init_db_command, sync_products_command, migrate_orders_command,
+                                 serve_command, generate_images_command)
+from api8inf349.compression import gzip_response
+from api8inf349.json_provider import FastJSONProvider
+from api8inf349.database import add_query_listener
+from api8inf349.metrics import start_request, record_request, record_redis_command
+from api8inf349.profiler import begin_request_profile, profile_response, end_request_profile, record_query
+from api8inf349.redis_client import add_command_listener
 
 
 
 app = Flask(__name__)  # Define the global api8inf349 instance
+app.json = FastJSONProvider(app)
+app.before_request(start_request)
+app.before_request(begin_request_profile)
+app.after_request(record_request)
+app.after_request(profile_response)
+app.teardown_request(end_request_profile)
+app.after_request(gzip_response)
+add_query_listener(record_query)
+add_command_listener(record_redis_command)
 CORS(app)
 
 from api8inf349 import routes
+from api8inf349.assets import assets
+assets.build()  # manifeste des fichiers du frontend (empreintes, variantes gzip)
 app.cli.add_command(init_db_command)
+app.cli.add_command(sync_products_command)
+app.cli.add_command(migrate_orders_command)
+app.cli.add_command(serve_command)
+app.cli.add_command(generate_images_command)
 
 print(" Flask api8inf349 loaded from __init__.py")
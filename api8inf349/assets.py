@@ -0,0 +1,209 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from flask import Response, current_app, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+from api8inf349.compression import COMPRESSIBLE_MIMETYPES, GZIP_ETAG_SUFFIX, etag_matches, matched_etag
+from api8inf349.config import Config
+from api8inf349.json_provider import dumps_bytes
+
+FRONTEND_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend"))
+URL_PREFIX = "/frontend/"
+
+# Attributs href/src des pages HTML pointant vers un fichier local (pas d'URL absolue ni d'ancre)
+_LOCAL_REF = re.compile(r'\b(href|src)="(?![a-z]+:|//|#)([^"?#]+)"')
+
+
+class Asset:
+    """Fichier du frontend: empreinte du contenu et variante gzip précalculée."""
+    __slots__ = ("path", "filename", "mimetype", "digest", "size", "mtime", "body", "gzipped")
+
+    def __init__(self, path, filename, mimetype, data, mtime, rewritten=False):
+        self.path = path
+        self.filename = filename
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        self.size = len(data)
+        self.mtime = mtime
+        # Contenu gardé seulement s'il diffère du disque (pages HTML réécrites)
+        self.body = data if rewritten else None
+        # Variante gzip (JS, CSS, HTML): calculée une fois, gardée si elle est plus petite
+        self.gzipped = None
+        if mimetype in COMPRESSIBLE_MIMETYPES and self.size >= Config.GZIP_MIN_SIZE:
+            compressed = gzip.compress(data, compresslevel=9)
+            if len(compressed) < self.size:
+                self.gzipped = compressed
+
+
+class AssetStore:
+    """Manifeste des fichiers du frontend (chemin -> empreinte) construit au démarrage.
+
+    - les URL versionnées (`?v=<empreinte>`) sont servies avec `immutable`;
+    - les pages HTML sont réécrites pour pointer vers ces URL et reçoivent le
+      manifeste (`assetUrl(chemin)` pour les images construites en JavaScript);
+    - les petits fichiers restent en mémoire (LRU borné par ASSET_CACHE_MAX_BYTES),
+      les autres sont relus sur disque.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest = {}
+        self._cache = OrderedDict()  # empreinte -> contenu, du moins au plus récemment servi
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    def build(self):
+        files = {}
+        for directory, _, filenames in os.walk(self.root):
+            for name in filenames:
+                filename = os.path.join(directory, name)
+                files[os.path.relpath(filename, self.root).replace(os.sep, "/")] = filename
+
+        assets = {path: self._load(path, filename)
+                  for path, filename in files.items() if not path.endswith(".html")}
+        # Pages HTML en dernier: elles référencent les empreintes des autres fichiers
+        versions = {path: asset.digest for path, asset in assets.items()}
+        for path, filename in files.items():
+            if path.endswith(".html"):
+                assets[path] = self._load(path, filename, versions)
+
+        with self._lock:
+            self.manifest = assets
+            self._cache.clear()
+            self._cache_bytes = 0
+        return self
+
+    def _load(self, path, filename, versions=None):
+        with open(filename, "rb") as file:
+            data = file.read()
+        if versions is not None:
+            data = self._rewrite_html(path, data, versions)
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        return Asset(path, filename, mimetype, data, os.path.getmtime(filename), rewritten=versions is not None)
+
+    def _rewrite_html(self, path, data, versions):
+        base = os.path.dirname(path)
+
+        def versioned(match):
+            attribute, ref = match.groups()
+            target = self.resolve(ref, base)
+            if target in versions:
+                return f'{attribute}="{URL_PREFIX}{target}?v={versions[target]}"'
+            return match.group(0)
+
+        text = _LOCAL_REF.sub(versioned, data.decode("utf-8"))
+        script = ("<script>window.ASSET_VERSIONS=" + dumps_bytes(versions).decode() + ";"
+                  "function assetUrl(path){const v=window.ASSET_VERSIONS[path];"
+                  f"return \"{URL_PREFIX}\"+path+(v?\"?v=\"+v:\"\");}}"
+                  # Image redimensionnée (GET /img/<fichier>?w=), versionnée comme l'original
+                  "function imageUrl(name,width){const v=window.ASSET_VERSIONS[\"static/img/\"+name];"
+                  "return \"/img/\"+name+\"?w=\"+width+(v?\"&v=\"+v:\"\");}</script>\n")
+        return text.replace("</head>", script + "</head>", 1).encode("utf-8")
+
+    @staticmethod
+    def resolve(ref, base=""):
+        """URL d'un fichier local -> chemin dans le manifeste (`/img/1.jpg` -> `static/img/1.jpg`)."""
+        if ref.startswith(URL_PREFIX):
+            return ref[len(URL_PREFIX):]
+        if ref.startswith("/img/"):
+            return "static/img/" + ref[len("/img/"):]
+        if ref.startswith("/"):
+            return None
+        return os.path.normpath(os.path.join(base, ref)).replace(os.sep, "/")
+
+    def get(self, path):
+        asset = self.manifest.get(path)
+        if asset is None:
+            return self._add(path)
+        # En debug, un fichier modifié est relu (nouvelle empreinte)
+        if current_app.debug:
+            filename = safe_join(self.root, path)
+            if filename and os.path.isfile(filename) and os.path.getmtime(filename) != asset.mtime:
+                return self.build().manifest.get(path)
+        return asset
+
+    def _add(self, path):
+        """Fichier ajouté après le démarrage (ex. image d'un nouveau produit):
+        ajouté au manifeste au premier accès. Les pages HTML, réécrites avec les
+        empreintes des autres fichiers, demandent un `build()`."""
+        filename = safe_join(self.root, path)
+        if not filename or path.endswith(".html") or not os.path.isfile(filename):
+            return None
+        asset = self._load(path, filename)
+        with self._lock:
+            self.manifest = {**self.manifest, path: asset}
+        return asset
+
+    def _read(self, asset):
+        """Contenu du fichier: en mémoire (LRU) s'il fait au plus ASSET_CACHE_MAX_FILE,
+        sinon None (le fichier est alors envoyé depuis le disque)."""
+        if asset.body is not None:
+            return asset.body
+        if asset.size > Config.ASSET_CACHE_MAX_FILE:
+            return None
+        with self._lock:
+            data = self._cache.get(asset.digest)
+            if data is not None:
+                self._cache.move_to_end(asset.digest)
+                return data
+
+        with open(asset.filename, "rb") as file:
+            data = file.read()
+        with self._lock:
+            if asset.digest not in self._cache:
+                self._cache[asset.digest] = data
+                self._cache_bytes += len(data)
+            while self._cache_bytes > Config.ASSET_CACHE_MAX_BYTES:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+        return data
+
+    @staticmethod
+    def cache_control(asset):
+        """`immutable` si l'URL porte l'empreinte courante (`?v=`), sauf pour les pages HTML."""
+        if asset.mimetype == "text/html":
+            return "no-cache"
+        if request.args.get("v") == asset.digest:
+            return Config.ASSET_IMMUTABLE_CACHE_CONTROL
+        return Config.ASSET_CACHE_CONTROL
+
+    def response(self, path):
+        asset = self.get(path)
+        if asset is None:
+            raise NotFound()
+
+        use_gzip = asset.gzipped is not None and "gzip" in request.accept_encodings
+        if etag_matches(asset.digest):
+            response = Response(status=304)
+            response.set_etag(matched_etag(asset.digest))
+        else:
+            data = None if use_gzip else self._read(asset)
+            if use_gzip:
+                response = Response(asset.gzipped, mimetype=asset.mimetype)
+                response.headers["Content-Encoding"] = "gzip"
+            elif data is not None:
+                response = Response(data, mimetype=asset.mimetype)
+            else:
+                response = send_file(asset.filename, mimetype=asset.mimetype, etag=False, conditional=False)
+            response.set_etag(asset.digest + GZIP_ETAG_SUFFIX if use_gzip else asset.digest)
+
+        response.headers["Cache-Control"] = self.cache_control(asset)
+        if asset.gzipped is not None:
+            response.vary.add("Accept-Encoding")
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self.manifest),
+                "cached_files": len(self._cache),
+                "cached_bytes": self._cache_bytes,
+            }
+
+
+assets = AssetStore(FRONTEND_DIR)
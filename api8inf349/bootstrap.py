@@ -1,29 +1,106 @@
-import requests
+import time
+from redis.exceptions import RedisError
 from api8inf349.models import Product
 from api8inf349.database import database
+from api8inf349.catalog import bump_catalog_version, PRODUCT_FIELDS
+from api8inf349.config import Config
+from api8inf349.gateway import gateway
+from api8inf349.redis_client import redis_client
 
-PRODUCTS_URL = "http://dimensweb.uqac.ca/~jgnault/shops/products/"
+
+# Validateurs HTTP de la dernière synchronisation (requête conditionnelle)
+CATALOG_ETAG_KEY = "catalog:etag"
+CATALOG_LAST_MODIFIED_KEY = "catalog:last_modified"
 
 def sanitize(text):
     if text:
         return text.replace('\x00', '')
     return text
 
-def fetch_products():
-    response = requests.get(PRODUCTS_URL)
-    if response.status_code == 200:
-        data = response.json()["products"]
+def product_row(item):
+    return (
+        item["id"],
+        sanitize(item["name"]),
+        sanitize(item["description"]),
+        item["price"],
+        item["weight"],
+        item["in_stock"],
+        sanitize(item["image"])
+    )
+
+def conditional_headers():
+    try:
+        etag, last_modified = redis_client.mget(CATALOG_ETAG_KEY, CATALOG_LAST_MODIFIED_KEY)
+    except RedisError:
+        return {}
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag.decode()
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified.decode()
+    return headers
+
+def save_validators(response):
+    try:
+        pipe = redis_client.pipeline()
+        for key, header in ((CATALOG_ETAG_KEY, "ETag"), (CATALOG_LAST_MODIFIED_KEY, "Last-Modified")):
+            if response.headers.get(header):
+                pipe.set(key, response.headers[header])
+            else:
+                pipe.delete(key)
+        pipe.execute()
+    except RedisError:
+        pass
+
+def sync_products(conditional=True):
+    """Synchronise le catalogue distant avec la table Product.
+
+    Seuls les produits nouveaux ou modifiés sont écrits, par lots de
+    `insert_many(...).on_conflict(...)`. Retourne un rapport:
+    statut, nombre de produits insérés/modifiés/inchangés et durée.
+    """
+    start = time.monotonic()
+    report = {"status": "synced", "inserted": 0, "updated": 0, "unchanged": 0}
+
+    headers = conditional_headers() if conditional else {}
+    response = gateway.get(Config.PRODUCTS_URL, name="products", headers=headers)
+
+    if response.status_code == 304:
+        report["status"] = "not-modified"
+    elif response.status_code != 200:
+        report["status"] = "error"
+        report["http_status"] = response.status_code
+    else:
+        existing = {row[0]: row for row in Product.select(*PRODUCT_FIELDS).tuples()}
+        changed = []
+        for item in response.json()["products"]:
+            row = product_row(item)
+            current = existing.get(row[0])
+            if current is None:
+                report["inserted"] += 1
+            elif current != row:
+                report["updated"] += 1
+            else:
+                report["unchanged"] += 1
+                continue
+            changed.append(row)
 
         with database.atomic():
-            for item in data:
-                Product.get_or_create(
-                    id=item["id"],
-                    defaults={
-                        "name": sanitize(item["name"]),
-                        "description": sanitize(item["description"]),
-                        "price": item["price"],
-                        "weight": item["weight"],
-                        "in_stock": item["in_stock"],
-                        "image": sanitize(item["image"])
-                    }
-                )
\ No newline at end of file
+            for i in range(0, len(changed), Config.SYNC_CHUNK_SIZE):
+                (Product
+                 .insert_many(changed[i:i + Config.SYNC_CHUNK_SIZE], fields=PRODUCT_FIELDS)
+                 .on_conflict(conflict_target=[Product.id], preserve=PRODUCT_FIELDS[1:])
+                 .execute())
+
+        save_validators(response)
+
+        # Les processus de l'API rechargent leur catalogue en mémoire
+        if changed:
+            bump_catalog_version()
+
+    report["seconds"] = round(time.monotonic() - start, 3)
+    return report
+
+def fetch_products():
+    # Chargement complet (ex. après `flask init-db`), sans requête conditionnelle
+    return sync_products(conditional=False)
@@ -0,0 +1,138 @@
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from redis.exceptions import RedisError
+from api8inf349.config import Config
+from api8inf349.models import Product
+from api8inf349.redis_client import redis_client
+from api8inf349.search import SearchIndex
+
+# Version du catalogue, remplacée à chaque synchronisation (bootstrap.fetch_products).
+# Jeton aléatoire plutôt qu'un compteur: après un redémarrage de Redis, un ETag
+# ne peut pas reprendre une ancienne valeur pour un autre contenu
+CATALOG_VERSION_KEY = "catalog:version"
+
+PRODUCT_FIELDS = (Product.id, Product.name, Product.description, Product.price,
+                  Product.weight, Product.in_stock, Product.image)
+
+
+class CatalogProduct:
+    """Copie légère d'une ligne `Product` (pas d'instance peewee)."""
+    __slots__ = ("id", "name", "description", "price", "weight", "in_stock", "image")
+
+    def __init__(self, id, name, description, price, weight, in_stock, image):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.price = price
+        self.weight = weight
+        self.in_stock = in_stock
+        self.image = image
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class Catalog:
+    """Catalogue en mémoire, rechargé lorsque la version dans Redis change."""
+
+    def __init__(self):
+        self.version = None
+        self.products = {}
+        self.ids = []  # ids triés, pour la pagination
+        self.index = SearchIndex([])
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        self.ensure_fresh()
+        return len(self.ids)
+
+    def ensure_fresh(self):
+        # Vérification de version au plus une fois par intervalle
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < Config.CATALOG_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+
+        version = read_catalog_version()
+        if self.version is None or (version is not None and version != self.version):
+            self.reload(version)
+
+    def reload(self, version=None):
+        with self._lock:
+            products = {
+                row[0]: CatalogProduct(*row)
+                for row in Product.select(*PRODUCT_FIELDS).order_by(Product.id).tuples()
+            }
+            self.products = products
+            self.ids = list(products)
+            self.index = SearchIndex(list(products.values()))
+            # Sans Redis: jeton propre à ce chargement
+            self.version = version if version is not None else new_catalog_version()
+            self._checked_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self.version = None
+            self.products = {}
+            self.ids = []
+            self.index = SearchIndex([])
+
+    def get(self, product_id):
+        self.ensure_fresh()
+        return self.products.get(product_id)
+
+    def get_many(self, product_ids):
+        self.ensure_fresh()
+        products = self.products
+        return {pid: products[pid] for pid in product_ids if pid in products}
+
+    def page(self, page, limit):
+        self.ensure_fresh()
+        start = (page - 1) * limit
+        return [self.products[pid] for pid in self.ids[start:start + limit]]
+
+    def after(self, product_id, limit):
+        self.ensure_fresh()
+        start = bisect_right(self.ids, product_id)
+        return [self.products[pid] for pid in self.ids[start:start + limit]]
+
+    def search(self, query=None, in_stock=None, min_price=None, max_price=None, sort=None,
+               offset=0, limit=None):
+        """`(nombre de résultats, produits de la page)` (voir `SearchIndex.search`)."""
+        self.ensure_fresh()
+        return self.index.search(query, in_stock, min_price, max_price, sort, offset, limit)
+
+
+def new_catalog_version():
+    return uuid.uuid4().hex[:16]
+
+
+def read_catalog_version():
+    """Jeton de version du catalogue (créé s'il manque, ex. Redis vidé),
+    ou None si Redis est indisponible."""
+    try:
+        version = redis_client.get(CATALOG_VERSION_KEY)
+        if version is None:
+            # Le premier processus fixe le jeton, les autres le relisent
+            redis_client.set(CATALOG_VERSION_KEY, new_catalog_version(), nx=True)
+            version = redis_client.get(CATALOG_VERSION_KEY)
+    except RedisError:
+        return None
+    return version.decode() if version is not None else None
+
+
+def bump_catalog_version():
+    """Signale aux autres processus que le catalogue a changé."""
+    version = new_catalog_version()
+    try:
+        redis_client.set(CATALOG_VERSION_KEY, version)
+    except RedisError:
+        version = None
+    catalog.reload(version)
+    return version
+
+
+catalog = Catalog()
@@ -1,9 +1,11 @@
 import click
 from flask import current_app
-from flask.cli import with_appcontext
+from flask.cli import with_appcontext, pass_script_info
 from api8inf349.models import Product, Order, OrderProduct
 from api8inf349.database import database
-from api8inf349.bootstrap import fetch_products
+from api8inf349.bootstrap import fetch_products, sync_products
+from api8inf349.orders import add_order_columns, backfill_order_aggregates
+from api8inf349 import images, server
 
 
 @click.command("init-db")
@@ -17,3 +19,74 @@ def init_db_command():
 
     fetch_products()
     click.echo("Products loaded")
+
+
+@click.command("sync-products")
+@click.option("--force", is_flag=True, help="Ignore l'ETag/Last-Modified de la dernière synchronisation.")
+@click.option("--no-images", is_flag=True, help="Ne génère pas les tailles standard des images.")
+@with_appcontext
+def sync_products_command(force, no_images):
+    """Met à jour les produits à partir du catalogue distant, sans supprimer de table."""
+    with database:
+        Product._schema.create_indexes(safe=True)
+        report = sync_products(conditional=not force)
+
+    if report["status"] == "error":
+        raise click.ClickException(f"Catalogue distant indisponible (HTTP {report['http_status']})")
+    if report["status"] == "not-modified":
+        click.echo(f"Catalogue inchangé (304) en {report['seconds']}s")
+    else:
+        click.echo(
+            f"{report['inserted']} ajoutés, {report['updated']} modifiés, "
+            f"{report['unchanged']} inchangés en {report['seconds']}s"
+        )
+
+    if not no_images:
+        generate_images()
+
+
+def generate_images(formats=()):
+    if images.Image is None:
+        click.echo("Pillow n'est pas installé: images non générées")
+        return
+    generated, cached = images.pregenerate(formats=list(formats) or None)
+    click.echo(f"Images: {generated} générées, {cached} déjà en cache")
+
+
+@click.command("generate-images")
+@click.option("--fmt", "formats", multiple=True, type=click.Choice(sorted(images.FORMATS)),
+              help="Format à générer (répétable; défaut: celui de l'original).")
+@with_appcontext
+def generate_images_command(formats):
+    """Génère les tailles standard (IMAGE_WIDTHS) des images produits dans le cache disque."""
+    generate_images(formats)
+
+
+@click.command("migrate-orders")
+@click.option("--batch-size", default=1000, show_default=True, help="Commandes recalculées par transaction.")
+@with_appcontext
+def migrate_orders_command(batch_size):
+    """Ajoute les colonnes d'agrégats à `order` et les remplit pour les commandes existantes."""
+    with database:
+        missing = add_order_columns()
+        if missing:
+            click.echo(f"Colonnes ajoutées: {', '.join(missing)}")
+
+        updated = backfill_order_aggregates(batch_size)
+    click.echo(f"{updated} commandes mises à jour")
+
+
+@click.command("serve")
+@click.option("--bind", help="Adresse d'écoute (défaut: SERVER_BIND).")
+@click.option("--workers", type=int, help="Nombre de processus (défaut: SERVER_WORKERS).")
+@click.option("--threads", type=int, help="Threads par processus (défaut: SERVER_THREADS).")
+@pass_script_info
+def serve_command(info, bind, workers, threads):
+    """Démarre le serveur de production (gunicorn, plusieurs processus, application préchargée)."""
+    if server.Server is None:
+        raise click.ClickException("gunicorn n'est pas installé (pip install gunicorn)")
+    app = info.load_app()
+    # FLASK_DEBUG est ignoré: en production, pas de détection N+1, de relecture des
+    # fichiers du frontend ni de JSON indenté
+    app.debug = False
+    server.serve(app, bind=bind, workers=workers, threads=threads)
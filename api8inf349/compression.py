@@ -0,0 +1,53 @@
+import gzip
+from flask import request
+from api8inf349.config import Config
+
+# Suffixe ajouté à l'ETag de la variante compressée (l'ETag fort doit différer)
+GZIP_ETAG_SUFFIX = "-gz"
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/javascript",
+}
+
+
+def gzip_response(response):
+    """after_request: compresse les réponses assez grosses si le client accepte gzip."""
+    if (response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if "gzip" not in request.accept_encodings:
+        return response
+
+    data = response.get_data()
+    if len(data) < Config.GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=Config.GZIP_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag + GZIP_ETAG_SUFFIX)
+    return response
+
+
+def etag_matches(etag):
+    """If-None-Match correspond à l'ETag, compressé ou non."""
+    return request.if_none_match.contains(etag) or request.if_none_match.contains(etag + GZIP_ETAG_SUFFIX)
+
+
+def matched_etag(etag):
+    # ETag à renvoyer avec un 304: celui que le client possède déjà
+    if request.if_none_match.contains(etag + GZIP_ETAG_SUFFIX):
+        return etag + GZIP_ETAG_SUFFIX
+    return etag
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -11,3 +12,119 @@ class Config:
         f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
         f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
     )
+
+    DB_NAME = os.getenv("DB_NAME")
+    DB_USER = os.getenv("DB_USER")
+    DB_PASSWORD = os.getenv("DB_PASSWORD")
+    DB_HOST = os.getenv("DB_HOST")
+    DB_PORT = int(os.getenv("DB_PORT", 5432))
+
+    # Pool de connexions (à dimensionner selon `max_connections` de PostgreSQL)
+    DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 20))
+    DB_STALE_TIMEOUT = int(os.getenv("DB_STALE_TIMEOUT", 300))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+
+    # Pagination du catalogue (GET /)
+    PRODUCTS_PAGE_SIZE = int(os.getenv("PRODUCTS_PAGE_SIZE", 10))
+    PRODUCTS_MAX_LIMIT = int(os.getenv("PRODUCTS_MAX_LIMIT", 100))
+
+    # Liste des commandes (GET /order)
+    ORDERS_PAGE_SIZE = int(os.getenv("ORDERS_PAGE_SIZE", 50))
+    ORDERS_MAX_LIMIT = int(os.getenv("ORDERS_MAX_LIMIT", 500))
+    ORDERS_EXPORT_BATCH = int(os.getenv("ORDERS_EXPORT_BATCH", 1000))
+    # Nombre maximal de commandes par lecture groupée (GET/POST /orders)
+    ORDERS_LOOKUP_MAX = int(os.getenv("ORDERS_LOOKUP_MAX", 100))
+    # Import en flux (POST /orders/bulk): paniers validés et insérés par lot, taille maximale d'une ligne
+    ORDERS_BULK_CHUNK = int(os.getenv("ORDERS_BULK_CHUNK", 500))
+    ORDERS_BULK_MAX_LINE = int(os.getenv("ORDERS_BULK_MAX_LINE", 64 * 1024))
+
+    # Cache Redis des documents de commande
+    ORDER_CACHE_TTL = int(os.getenv("ORDER_CACHE_TTL", 3600))
+    ORDER_CACHE_PAID_TTL = int(os.getenv("ORDER_CACHE_PAID_TTL", 7 * 24 * 3600))
+    ORDER_CACHE_MAX_BYTES = int(os.getenv("ORDER_CACHE_MAX_BYTES", 64 * 1024))
+    ORDER_CACHE_LOCK_MS = int(os.getenv("ORDER_CACHE_LOCK_MS", 2000))
+    ORDER_CACHE_POLL_MS = int(os.getenv("ORDER_CACHE_POLL_MS", 20))
+
+    # Client HTTP des services distants (paiement, catalogue)
+    GATEWAY_CONNECT_TIMEOUT = float(os.getenv("GATEWAY_CONNECT_TIMEOUT", 3.05))
+    GATEWAY_READ_TIMEOUT = float(os.getenv("GATEWAY_READ_TIMEOUT", 15))
+    GATEWAY_MAX_RETRIES = int(os.getenv("GATEWAY_MAX_RETRIES", 2))
+    GATEWAY_BACKOFF = float(os.getenv("GATEWAY_BACKOFF", 0.2))
+    GATEWAY_BACKOFF_MAX = float(os.getenv("GATEWAY_BACKOFF_MAX", 2.0))
+    GATEWAY_POOL_SIZE = int(os.getenv("GATEWAY_POOL_SIZE", 10))
+
+    # Files RQ et processus worker
+    # WORKER_POOLS: groupes séparés par `;`, files par ordre de priorité, puis `:nombre`
+    PAYMENTS_QUEUE = os.getenv("PAYMENTS_QUEUE", "payments")
+    MAINTENANCE_QUEUE = os.getenv("MAINTENANCE_QUEUE", "maintenance")
+    WORKER_POOLS = os.getenv("WORKER_POOLS", "payments,default:2;maintenance:1")
+    WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", 60))
+    WORKER_REPORT_INTERVAL = float(os.getenv("WORKER_REPORT_INTERVAL", 30))
+    WORKER_RESTART_DELAY = float(os.getenv("WORKER_RESTART_DELAY", 5))
+    # Port de l'exporteur de métriques du superviseur (0: désactivé)
+    WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", 9101))
+    # Délai maximal (secondes) avant l'envoi dans Redis des métriques de l'API
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1.0))
+
+    # Flux Server-Sent Events (GET /job/<id>/events)
+    SSE_MAX_DURATION = float(os.getenv("SSE_MAX_DURATION", 120))
+    SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", 15))
+    # Flux ouverts en même temps par processus (chacun occupe un thread: < SERVER_THREADS)
+    SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", 2))
+
+    # Synchronisation du catalogue (flask sync-products)
+    SYNC_CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", 500))
+
+    # En-têtes Cache-Control (les réponses portent un ETag; les clients revalident)
+    CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=30")
+    ORDER_CACHE_CONTROL = os.getenv("ORDER_CACHE_CONTROL", "private, no-cache")
+
+    # Compression gzip des réponses (taille minimale en octets)
+    GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", 1024))
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+
+    # Idempotence: durée de conservation des réponses rejouables, délai maximal
+    # de traitement d'une requête, et verrou d'un paiement en cours (> timeouts passerelle)
+    IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))
+    IDEMPOTENCY_PENDING_TTL = int(os.getenv("IDEMPOTENCY_PENDING_TTL", 60))
+    PAYMENT_LOCK_TTL = int(os.getenv("PAYMENT_LOCK_TTL", 600))
+
+    # Services distants: catalogue et passerelle de paiement
+    PRODUCTS_URL = os.getenv("PRODUCTS_URL", "http://dimensweb.uqac.ca/~jgnault/shops/products/")
+    PAYMENT_URL = os.getenv("PAYMENT_URL", "https://dimensweb.uqac.ca/~jgnault/shops/pay/")
+
+    # Profil SQL: seuil des requêtes lentes (journalisées), détection N+1
+    # (off / warn / raise; par défaut raise en test et warn en debug) et en-tête X-DB
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+    SQL_N_PLUS_ONE = os.getenv("SQL_N_PLUS_ONE", "")
+    N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+    SQL_PROFILE_HEADER = os.getenv("SQL_PROFILE_HEADER", "false").lower() in ("1", "true", "yes")
+
+    # Serveur de production (flask serve): processus et threads par processus
+    # (threads <= DB_MAX_CONNECTIONS: chaque processus a son propre pool)
+    SERVER_BIND = os.getenv("SERVER_BIND", "0.0.0.0:5000")
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", min(2 * (os.cpu_count() or 1) + 1, 8)))
+    SERVER_THREADS = int(os.getenv("SERVER_THREADS", 4))
+    SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", 30))
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 30))
+    SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", 5))
+    # Recyclage des processus après N requêtes (0: jamais), avec une part aléatoire
+    SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", 0))
+    SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 0))
+
+    # Fichiers du frontend: URL versionnées (?v=<empreinte>) mises en cache sans limite,
+    # autres URL revalidées; petits fichiers gardés en mémoire (LRU)
+    ASSET_IMMUTABLE_CACHE_CONTROL = os.getenv("ASSET_IMMUTABLE_CACHE_CONTROL", "public, max-age=31536000, immutable")
+    ASSET_CACHE_CONTROL = os.getenv("ASSET_CACHE_CONTROL", "public, max-age=300")
+    ASSET_CACHE_MAX_FILE = int(os.getenv("ASSET_CACHE_MAX_FILE", 256 * 1024))
+    ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+    # Dérivés des images produits (GET /img/<fichier>?w=&fmt=): largeurs permises
+    # (générées d'avance par flask sync-products / generate-images) et cache disque borné
+    IMAGE_WIDTHS = os.getenv("IMAGE_WIDTHS", "120,200,400")
+    IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 80))
+    IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "api8inf349-images"))
+    IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+    # Délai (secondes) entre deux vérifications de la version du catalogue en mémoire
+    CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", 1.0))
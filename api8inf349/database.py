@@ -1,20 +1,117 @@
-from peewee import PostgresqlDatabase
+import functools
+import threading
+import time
+from peewee import DatabaseProxy
+from playhouse.pool import PooledDatabase, PooledPostgresqlDatabase, MaxConnectionsExceeded
 from api8inf349.config import Config
-import os
-import requests
+
+
+class StatsPooledPostgresqlDatabase(PooledPostgresqlDatabase):
+    """Pool de connexions PostgreSQL qui mesure le temps d'attente d'une connexion."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._acquired = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def connect(self, reuse_if_open=False):
+        if not reuse_if_open or self.is_closed():
+            start = time.monotonic()
+            try:
+                return super().connect(reuse_if_open)
+            except MaxConnectionsExceeded:
+                with self._stats_lock:
+                    self._timeouts += 1
+                raise
+            finally:
+                waited = time.monotonic() - start
+                with self._stats_lock:
+                    self._acquired += 1
+                    self._wait_total += waited
+                    self._wait_max = max(self._wait_max, waited)
+        return super().connect(reuse_if_open)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "max_connections": self._max_connections,
+                "in_use": len(self._in_use),
+                "idle": len(self._connections),
+                "acquired": self._acquired,
+                "timeouts": self._timeouts,
+                "wait_total_ms": round(self._wait_total * 1000, 3),
+                "wait_max_ms": round(self._wait_max * 1000, 3)
+            }
+
+
+def create_database():
+    return StatsPooledPostgresqlDatabase(
+        Config.DB_NAME,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        host=Config.DB_HOST,
+        port=Config.DB_PORT,
+        max_connections=Config.DB_MAX_CONNECTIONS,
+        stale_timeout=Config.DB_STALE_TIMEOUT,
+        timeout=Config.DB_POOL_TIMEOUT
+    )
+
+
+# Écouteurs appelés après chaque requête exécutée par les modèles: `listener(query, secondes)`
+_query_listeners = []
+
+
+def add_query_listener(listener):
+    _query_listeners.append(listener)
+
+
+class InstrumentedDatabaseProxy(DatabaseProxy):
+    """Proxy qui mesure chaque requête des modèles, quelle que soit la base branchée."""
+
+    def execute(self, query, commit=None, **context_options):
+        start = time.perf_counter()
+        try:
+            return self.obj.execute(query, commit, **context_options)
+        finally:
+            elapsed = time.perf_counter() - start
+            for listener in _query_listeners:
+                listener(query, elapsed)
+
+
+def record_sql(db, record):
+    """Appelle `record(sql)` pour chaque requête exécutée par `db`, transactions
+    comprises (tests et banc d'essai: nombre exact de requêtes SQL)."""
+    execute_sql = db.execute_sql
+
+    def recording_execute_sql(sql, params=None, *args, **kwargs):
+        record(sql)
+        return execute_sql(sql, params, *args, **kwargs)
+
+    db.execute_sql = recording_execute_sql
 
 
 # Initialisation de la base de données
-database = PostgresqlDatabase(
-    os.getenv('DB_NAME'),
-    user=os.getenv('DB_USER'),
-    password=os.getenv('DB_PASSWORD'),
-    host=os.getenv('DB_HOST'),
-    port=int(os.getenv('DB_PORT'))
-)
+# (proxy: permet de brancher une autre base, ex. SQLite pour les tests)
+database = InstrumentedDatabaseProxy()
+database.initialize(create_database())
 
 
+def pool_stats():
+    """Statistiques du pool (None si la base courante n'est pas un pool)."""
+    if isinstance(database.obj, StatsPooledPostgresqlDatabase):
+        return database.obj.stats()
+    if isinstance(database.obj, PooledDatabase):
+        return {"in_use": len(database.obj._in_use), "idle": len(database.obj._connections)}
+    return None
 
 
-# # Fetch products on startup
-# fetch_products()
\ No newline at end of file
+def with_connection(func):
+    """Ouvre une connexion pour la durée d'une tâche (job RQ) puis la rend au pool."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with database.connection_context():
+            return func(*args, **kwargs)
+    return wrapper
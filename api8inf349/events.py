@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+from redis.exceptions import RedisError
+from api8inf349.redis_client import redis_client
+
+# Canal pub/sub des transitions d'un job de paiement
+JOB_CHANNEL = "job:{}:events"
+
+TERMINAL_STATUSES = ("finished", "failed")
+
+
+class StreamSlots:
+    """Nombre de flux SSE ouverts dans le processus. Chaque flux occupe un thread
+    du serveur (gthread) jusqu'à SSE_MAX_DURATION: au-delà de la limite, le
+    client est renvoyé au polling pour garder des threads aux autres requêtes."""
+
+    def __init__(self):
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, limit):
+        with self._lock:
+            if self.active >= limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+
+stream_slots = StreamSlots()
+
+
+def publish_job_event(job_id, status, **data):
+    """Publie une transition de statut (best effort: Redis indisponible = ignoré)."""
+    if not job_id:
+        return
+    payload = json.dumps({"id": job_id, "status": status, **data})
+    try:
+        redis_client.publish(JOB_CHANNEL.format(job_id), payload)
+    except RedisError:
+        pass
+
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def job_event_stream(job_id, current_state, max_duration, heartbeat):
+    """Générateur Server-Sent Events pour un job.
+
+    L'abonnement est pris avant de lire l'état courant (`current_state()`,
+    qui retourne un dict avec au moins `status`), pour ne perdre aucune
+    transition. Le flux se termine au premier statut final, ou après
+    `max_duration` secondes (le client repasse alors en mode polling).
+    """
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(JOB_CHANNEL.format(job_id))
+    try:
+        state = current_state()
+        yield sse_message(state["status"], state)
+        if state["status"] in TERMINAL_STATUSES:
+            return
+
+        deadline = time.monotonic() + max_duration
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=heartbeat)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+
+            state = json.loads(message["data"])
+            yield sse_message(state["status"], state)
+            if state["status"] in TERMINAL_STATUSES:
+                return
+
+        yield sse_message("timeout", {"id": job_id})
+    finally:
+        pubsub.close()
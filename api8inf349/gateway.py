@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from api8inf349.config import Config
+
+# Réponses transitoires pour lesquelles on peut réessayer
+RETRY_STATUSES = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class GatewayClient:
+    """Client HTTP partagé pour les services distants (paiement, catalogue).
+
+    - connexions keep-alive réutilisées (une `Session` et un pool par hôte);
+    - délais de connexion et de lecture toujours bornés;
+    - nouvelles tentatives limitées, avec backoff aléatoire, sur les 5xx
+      transitoires et les erreurs réseau, seulement pour les appels
+      idempotents (un POST n'est réessayé que si la connexion n'a jamais
+      été établie);
+    - latence enregistrée pour chaque appel.
+    """
+
+    def __init__(self, connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff=None, backoff_max=None, pool_size=None):
+        self.connect_timeout = connect_timeout if connect_timeout is not None else Config.GATEWAY_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout if read_timeout is not None else Config.GATEWAY_READ_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else Config.GATEWAY_MAX_RETRIES
+        self.backoff = backoff if backoff is not None else Config.GATEWAY_BACKOFF
+        self.backoff_max = backoff_max if backoff_max is not None else Config.GATEWAY_BACKOFF_MAX
+        self.pool_size = pool_size if pool_size is not None else Config.GATEWAY_POOL_SIZE
+
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self._listeners = []
+        self.session = self._create_session()
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def reset(self):
+        """Recrée la session (ex. dans un processus enfant après un fork)."""
+        self.session.close()
+        self.session = self._create_session()
+
+    def add_listener(self, listener):
+        """`listener(name, seconds, status)` est appelé après chaque tentative
+        (`status` vaut None en cas d'erreur réseau)."""
+        self._listeners.append(listener)
+
+    def request(self, method, url, name=None, idempotent=None, **kwargs):
+        method = method.upper()
+        name = name or url
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout))
+
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(name, time.monotonic() - start, None)
+                # Sans idempotence, on ne réessaie que si rien n'a été envoyé
+                retryable = idempotent or _not_sent(e)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+            else:
+                self._record(name, time.monotonic() - start, response.status_code)
+                if not idempotent or response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+
+            time.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _backoff_delay(self, attempt):
+        # Backoff exponentiel avec "full jitter"
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    def _record(self, name, seconds, status):
+        with self._stats_lock:
+            stats = self._stats.setdefault(name, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["calls"] += 1
+            if status is None or status >= 500:
+                stats["errors"] += 1
+            stats["total_ms"] += seconds * 1000
+            stats["max_ms"] = max(stats["max_ms"], seconds * 1000)
+        for listener in self._listeners:
+            listener(name, seconds, status)
+
+    def stats(self):
+        with self._stats_lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def _not_sent(error):
+    """Vrai si la requête n'a jamais atteint le serveur (connexion impossible)."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+gateway = GatewayClient()
@@ -0,0 +1,141 @@
+import functools
+import hashlib
+import json
+import uuid
+from flask import current_app, jsonify, request
+from redis.exceptions import RedisError
+from api8inf349.config import Config
+from api8inf349.redis_client import redis_client
+
+IDEMPOTENCY_KEY = "idempotency:{}:{}:{}"
+PAYMENT_LOCK_KEY = "order:{}:payment"
+ORDER_UPDATE_PREFIX = "update:"
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def idempotency_error(code, name, status):
+    return jsonify({"errors": {"idempotency_key": {"code": code, "name": name}}}), status
+
+
+def idempotent(view):
+    """Rejoue la réponse enregistrée quand une requête revient avec le même `Idempotency-Key`.
+
+    La première requête réserve la clé (SET NX) le temps d'être traitée; une
+    requête concurrente avec la même clé reçoit 409. Les réponses 5xx ne sont
+    pas enregistrées pour que le client puisse réessayer.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return idempotency_error("invalid-value", f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters", 400)
+
+        redis_key = IDEMPOTENCY_KEY.format(request.method, request.path, key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        try:
+            reserved = redis_client.set(redis_key, json.dumps({"fingerprint": fingerprint}),
+                                        nx=True, ex=Config.IDEMPOTENCY_PENDING_TTL)
+            saved = None if reserved else redis_client.get(redis_key)
+        except RedisError:
+            # Sans Redis, la requête est traitée normalement
+            return view(*args, **kwargs)
+
+        if saved is not None:
+            saved = json.loads(saved)
+            if saved["fingerprint"] != fingerprint:
+                return idempotency_error("key-reused", f"{IDEMPOTENCY_HEADER} already used with another payload", 422)
+            if "status" not in saved:
+                return idempotency_error("in-progress", "A request with this key is still being processed", 409)
+            response = current_app.response_class(saved["body"], status=saved["status"], mimetype=saved["mimetype"])
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            forget(redis_key)
+            raise
+
+        if response.status_code >= 500 or response.is_streamed:
+            forget(redis_key)
+        else:
+            record = {
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "mimetype": response.mimetype,
+                "body": response.get_data(as_text=True),
+            }
+            try:
+                redis_client.set(redis_key, json.dumps(record), ex=Config.IDEMPOTENCY_TTL)
+            except RedisError:
+                pass
+        return response
+
+    return wrapper
+
+
+def forget(redis_key):
+    try:
+        redis_client.delete(redis_key)
+    except RedisError:
+        pass
+
+
+def claim_payment(order_id, job_id):
+    """Réserve le paiement d'une commande pour `job_id`.
+    Retourne None si la réservation est obtenue, sinon l'id du job déjà en cours."""
+    lock_key = PAYMENT_LOCK_KEY.format(order_id)
+    while True:
+        if redis_client.set(lock_key, job_id, nx=True, ex=Config.PAYMENT_LOCK_TTL):
+            return None
+        current = redis_client.get(lock_key)
+        if current is not None:
+            return current.decode()
+        # Libéré entre les deux appels: on retente
+
+
+def release_payment(order_id, job_id):
+    """Libère la réservation, seulement si elle appartient encore à `job_id`."""
+    lock_key = PAYMENT_LOCK_KEY.format(order_id)
+
+    def release(pipe):
+        if pipe.get(lock_key) == job_id.encode():
+            pipe.multi()
+            pipe.delete(lock_key)
+
+    try:
+        redis_client.transaction(release, lock_key)
+    except RedisError:
+        pass
+
+
+def own_payment(order_id, job_id):
+    """Vérifie (compare-and-set), juste avant l'appel à la passerelle, que la
+    réservation appartient à `job_id` et la prolonge. Une réservation expirée
+    est reprise. Retourne False si un autre job la détient."""
+    lock_key = PAYMENT_LOCK_KEY.format(order_id)
+
+    def own(pipe):
+        current = pipe.get(lock_key)
+        if current is not None and current != job_id.encode():
+            return False
+        pipe.multi()
+        pipe.set(lock_key, job_id, ex=Config.PAYMENT_LOCK_TTL)
+        return True
+
+    return redis_client.transaction(own, lock_key, value_from_callable=True)
+
+
+def order_update_token():
+    """Jeton d'une mise à jour de l'expédition, réservée par `claim_payment` avec le
+    même verrou qu'un paiement: le montant débité ne change pas pendant un paiement,
+    et un paiement ne démarre pas pendant l'écriture."""
+    return ORDER_UPDATE_PREFIX + uuid.uuid4().hex
+
+
+def is_order_update(token):
+    return token.startswith(ORDER_UPDATE_PREFIX)
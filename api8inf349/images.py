@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from flask import Response, request, send_file
+from werkzeug.exceptions import NotFound
+from api8inf349.assets import assets
+from api8inf349.config import Config
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow est optionnel: les originaux sont alors servis tels quels
+    Image = None
+
+logger = logging.getLogger("api8inf349.images")
+
+IMAGE_PREFIX = "static/img/"
+
+# Format demandé (?fmt=) -> (format Pillow, extension, type MIME)
+FORMATS = {
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+    "webp": ("WEBP", "webp", "image/webp"),
+    "png": ("PNG", "png", "image/png"),
+}
+MIMETYPE_FORMATS = {mimetype: name for name, (_, _, mimetype) in FORMATS.items()}
+
+
+def parse_widths(spec):
+    """`"120,200,400"` -> `[120, 200, 400]`."""
+    return sorted({int(width) for width in spec.split(",") if width.strip()})
+
+
+class ImageCache:
+    """Dérivés d'images (redimensionnés / réencodés) dans un répertoire borné.
+
+    Un dérivé est identifié par le chemin et le mtime de l'original et par
+    une empreinte des paramètres: modifier l'original en produit un nouveau.
+    L'écriture passe par un fichier temporaire (plusieurs processus peuvent
+    générer le même dérivé); les moins récemment servis sont supprimés au-delà
+    de IMAGE_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or Config.IMAGE_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else Config.IMAGE_CACHE_MAX_BYTES
+        self._bytes = None  # taille du répertoire, calculée au premier dérivé généré
+        self._lock = threading.Lock()
+
+    def key(self, asset, width, fmt):
+        params = hashlib.sha256(f"{width}:{fmt}:{Config.IMAGE_QUALITY}".encode()).hexdigest()[:12]
+        return hashlib.sha256(f"{asset.path}:{asset.mtime}:{params}".encode()).hexdigest()[:24]
+
+    def path(self, key, fmt):
+        return os.path.join(self.directory, key[:2], f"{key}.{FORMATS[fmt][1]}")
+
+    def get(self, asset, width, fmt):
+        """Chemin du dérivé, généré s'il n'est pas encore dans le cache."""
+        path = self.path(self.key(asset, width, fmt), fmt)
+        try:
+            os.utime(path)  # dernier accès, pour l'éviction
+        except FileNotFoundError:
+            self._generate(asset.filename, path, width, fmt)
+        return path
+
+    def _generate(self, source, path, width, fmt):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pillow_format = FORMATS[fmt][0]
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original)
+            if width and width < image.width:
+                image.thumbnail((width, image.height * width // image.width + 1), Image.LANCZOS)
+            if pillow_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(handle, "wb") as file:
+                    image.save(file, pillow_format, quality=Config.IMAGE_QUALITY, optimize=True)
+                os.replace(temporary, path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        self._added(os.path.getsize(path))
+
+    def _added(self, size):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._files())
+            else:
+                self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._bytes = self._prune()
+
+    def _files(self):
+        for directory, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                filename = os.path.join(directory, name)
+                try:
+                    stat = os.stat(filename)
+                except FileNotFoundError:
+                    continue  # supprimé par un autre processus
+                yield filename, stat.st_size, stat.st_mtime
+
+    def _prune(self):
+        """Supprime les dérivés les moins récemment servis jusqu'à 90 % du budget."""
+        files = sorted(self._files(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in files)
+        for filename, size, _ in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+image_cache = ImageCache()
+
+
+def image_response(path, width=None, fmt=None):
+    """Dérivé de `frontend/<path>` (largeur et/ou format), depuis le cache disque."""
+    asset = assets.get(path)
+    if asset is None or asset.mimetype not in MIMETYPE_FORMATS:
+        raise NotFound()
+    if Image is None:
+        return assets.response(path)
+
+    fmt = fmt or MIMETYPE_FORMATS[asset.mimetype]
+    # La clé (original + paramètres) sert d'ETag: un 304 ne touche pas au disque
+    key = image_cache.key(asset, width, fmt)
+    if request.if_none_match.contains(key):
+        response = Response(status=304)
+    else:
+        response = send_file(image_cache.get(asset, width, fmt), mimetype=FORMATS[fmt][2],
+                             etag=False, conditional=False)
+    response.set_etag(key)
+    response.headers["Cache-Control"] = assets.cache_control(asset)
+    return response
+
+
+def pregenerate(widths=None, formats=None):
+    """Génère les tailles standard de toutes les images du frontend: `(générés, déjà en cache)`."""
+    if Image is None:
+        return 0, 0
+    widths = widths or parse_widths(Config.IMAGE_WIDTHS)
+    generated = cached = 0
+    for path, asset in list(assets.manifest.items()):
+        if not path.startswith(IMAGE_PREFIX) or asset.mimetype not in MIMETYPE_FORMATS:
+            continue
+        for fmt in formats or [MIMETYPE_FORMATS[asset.mimetype]]:
+            for width in widths:
+                if os.path.exists(image_cache.path(image_cache.key(asset, width, fmt), fmt)):
+                    cached += 1
+                    continue
+                try:
+                    image_cache.get(asset, width, fmt)
+                    generated += 1
+                except OSError as error:
+                    logger.warning("Cannot generate %s (%spx, %s): %s", path, width, fmt, error)
+    return generated, cached
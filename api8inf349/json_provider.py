@@ -0,0 +1,53 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel: on garde alors le module json standard
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Fournisseur JSON basé sur orjson (repli sur le fournisseur par défaut)."""
+
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"indent", "separators"}:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options(bool(kwargs.get("indent")))).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # Les octets produits par orjson sont envoyés tels quels
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def dumps_bytes(obj):
+    """Sérialise en octets UTF-8 (documents mis en cache, lignes NDJSON)."""
+    if orjson is None:
+        return json.dumps(obj).encode()
+    return orjson.dumps(obj)
+
+
+def loads_bytes(data):
+    """Désérialise des octets UTF-8 (lignes NDJSON reçues). Lève ValueError si invalide."""
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
@@ -0,0 +1,361 @@
+import threading
+import time
+from datetime import datetime
+from flask import has_request_context
+from redis.exceptions import RedisError
+from rq import Queue
+from rq.job import Job
+from rq.registry import StartedJobRegistry
+from api8inf349 import redis_client as redis_module
+from api8inf349.config import Config
+from api8inf349.profiler import current_profile
+
+# Bornes (secondes) des histogrammes de latence
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bornes des histogrammes de la passerelle et des jobs (appels distants, plus lents)
+REMOTE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+# Nombre de requêtes SQL par requête HTTP
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def format_labels(labelnames, labels):
+    pairs = []
+    for name in labelnames:
+        value = str(labels.get(name, "")).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return ",".join(pairs)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MemoryStore:
+    """Valeurs d'une métrique dans la mémoire du processus."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc_many(self, increments):
+        with self._lock:
+            for field, amount in increments:
+                self._values[field] = self._values.get(field, 0) + amount
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class RedisStore:
+    """Valeurs d'une métrique dans un hash Redis, partagées par tous les processus
+    (ex. les workers RQ, lus par l'exporteur du superviseur)."""
+
+    def __init__(self, key):
+        self.key = key
+
+    def inc_many(self, increments):
+        try:
+            pipe = redis_module.redis_client.pipeline(transaction=False)
+            for field, amount in increments:
+                if isinstance(amount, float):
+                    pipe.hincrbyfloat(self.key, field, amount)
+                else:
+                    pipe.hincrby(self.key, field, amount)
+            pipe.execute()
+        except RedisError:
+            pass  # Les métriques ne doivent jamais faire échouer un job
+
+    def items(self):
+        try:
+            values = redis_module.redis_client.hgetall(self.key)
+        except RedisError:
+            return []
+        return [(field.decode(), float(value)) for field, value in values.items()]
+
+
+class BufferedRedisStore(RedisStore):
+    """Hash Redis partagé par tous les processus de l'API (gunicorn), alimenté
+    par lots: les incréments restent en mémoire et sont envoyés en un pipeline
+    au plus une fois par METRICS_FLUSH_INTERVAL, et avant chaque export.
+    Une collecte voit ainsi le cumul de tous les processus, quel que soit
+    celui qui répond."""
+
+    def __init__(self, key):
+        super().__init__(key)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._next_flush = 0.0
+
+    def inc_many(self, increments):
+        with self._lock:
+            for field, amount in increments:
+                self._pending[field] = self._pending.get(field, 0) + amount
+            due = time.monotonic() >= self._next_flush
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            # Avant l'envoi: les commandes du pipeline sont elles-mêmes comptées (redis_commands)
+            self._next_flush = time.monotonic() + Config.METRICS_FLUSH_INTERVAL
+        if not pending:
+            return
+        try:
+            pipe = redis_module.redis_client.pipeline(transaction=False)
+            for field, amount in pending.items():
+                if isinstance(amount, float):
+                    pipe.hincrbyfloat(self.key, field, amount)
+                else:
+                    pipe.hincrby(self.key, field, amount)
+            pipe.execute()
+        except RedisError:
+            # Redis indisponible: renvoyé au prochain lot
+            self._requeue(pending)
+
+    def _requeue(self, pending):
+        with self._lock:
+            for field, amount in pending.items():
+                self._pending[field] = self._pending.get(field, 0) + amount
+
+    def discard(self):
+        """Processus enfant après un fork: oublie les incréments hérités du parent."""
+        with self._lock:
+            self._pending = {}
+
+    def items(self):
+        self.flush()
+        return super().items()
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=(), store=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.store = store or MemoryStore()
+
+    def inc(self, amount=1, **labels):
+        self.store.inc_many([(format_labels(self.labelnames, labels), amount)])
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.store.items()):
+            lines.append(f"{self.name}{{{labels}}} {format_value(value)}" if labels
+                         else f"{self.name} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Histogramme cumulatif au format Prometheus (`_bucket`, `_sum`, `_count`).
+
+    Chaque observation n'incrémente que son propre intervalle; les cumuls
+    sont calculés à l'export.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, store=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.store = store or MemoryStore()
+
+    def observe(self, value, **labels):
+        labelstr = format_labels(self.labelnames, labels)
+        bucket = next(bound for bound in self.buckets if value <= bound)
+        self.store.inc_many([
+            (f"bucket|{format_value(bucket)}|{labelstr}", 1),
+            (f"sum||{labelstr}", float(value)),
+            (f"count||{labelstr}", 1),
+        ])
+
+    def render(self):
+        series = {}
+        for field, value in self.store.items():
+            kind, bound, labelstr = field.split("|", 2)
+            entry = series.setdefault(labelstr, {"buckets": {}, "sum": 0, "count": 0})
+            if kind == "bucket":
+                entry["buckets"][bound] = value
+            else:
+                entry[kind] = value
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelstr, entry in sorted(series.items()):
+            prefix = f"{labelstr}," if labelstr else ""
+            cumulative = 0
+            for bound in self.buckets:
+                cumulative += entry["buckets"].get(format_value(bound), 0)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{format_value(bound)}"}} {format_value(cumulative)}')
+            suffix = f"{{{labelstr}}}" if labelstr else ""
+            lines.append(f"{self.name}_sum{suffix} {format_value(entry['sum'])}")
+            lines.append(f"{self.name}_count{suffix} {format_value(entry['count'])}")
+        return lines
+
+
+class Gauge:
+    """Jauge calculée au moment de l'export: `collect()` retourne `[(labels, valeur)]`."""
+
+    def __init__(self, name, documentation, labelnames, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect():
+            labelstr = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}{{{labelstr}}} {format_value(value)}" if labelstr
+                         else f"{self.name} {format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except RedisError:
+                continue  # Redis indisponible: la métrique est omise
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# Métriques des processus de l'API (dans Redis: cumulées sur tous les processus gunicorn)
+api_registry = Registry()
+
+http_requests = api_registry.register(Counter(
+    "http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status"),
+    store=BufferedRedisStore("metrics:http_requests_total")))
+http_duration = api_registry.register(Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "route"),
+    store=BufferedRedisStore("metrics:http_request_duration_seconds")))
+http_db_queries = api_registry.register(Histogram(
+    "http_request_db_queries", "Requêtes SQL par requête HTTP", ("route",), buckets=QUERY_COUNT_BUCKETS,
+    store=BufferedRedisStore("metrics:http_request_db_queries")))
+http_db_duration = api_registry.register(Histogram(
+    "http_request_db_seconds", "Temps passé en SQL par requête HTTP", ("route",),
+    store=BufferedRedisStore("metrics:http_request_db_seconds")))
+redis_commands = api_registry.register(Counter(
+    "redis_commands_total", "Commandes Redis envoyées par l'API", ("command",),
+    store=BufferedRedisStore("metrics:redis_commands_total")))
+
+
+def discard_pending_metrics():
+    """Processus enfant après un fork (voir `server.reinit_after_fork`)."""
+    for metric in api_registry.metrics:
+        if isinstance(getattr(metric, "store", None), BufferedRedisStore):
+            metric.store.discard()
+
+
+def queue_names():
+    return (Config.PAYMENTS_QUEUE, "default", Config.MAINTENANCE_QUEUE)
+
+
+def queue_depths():
+    return [({"queue": name}, Queue(name, connection=redis_module.redis_client).count)
+            for name in queue_names()]
+
+
+def started_jobs():
+    return [({"queue": name}, StartedJobRegistry(name, connection=redis_module.redis_client).count)
+            for name in queue_names()]
+
+
+def oldest_job_ages():
+    """Âge (secondes) du plus ancien job en attente de chaque file (0 si vide)."""
+    ages = []
+    for name in queue_names():
+        queue = Queue(name, connection=redis_module.redis_client)
+        job_ids = queue.get_job_ids(0, 0)
+        job = Job.fetch(job_ids[0], connection=redis_module.redis_client) if job_ids else None
+        # RQ enregistre `enqueued_at` en UTC sans fuseau
+        age = (datetime.utcnow() - job.enqueued_at).total_seconds() if job and job.enqueued_at else 0
+        ages.append(({"queue": name}, max(0.0, age)))
+    return ages
+
+
+api_registry.register(Gauge("rq_queue_depth", "Jobs en attente par file", ("queue",), queue_depths))
+api_registry.register(Gauge("rq_jobs_started", "Jobs en cours d'exécution par file", ("queue",), started_jobs))
+api_registry.register(Gauge("rq_oldest_job_age_seconds", "Âge du plus ancien job en attente", ("queue",),
+                            oldest_job_ages))
+
+# Métriques des workers (dans Redis: cumulées sur tous les processus worker)
+worker_registry = Registry()
+
+payment_jobs = worker_registry.register(Counter(
+    "payment_jobs_total", "Jobs process_payment terminés, par résultat", ("outcome",),
+    store=RedisStore("metrics:payment_jobs_total")))
+payment_duration = worker_registry.register(Histogram(
+    "payment_job_duration_seconds", "Durée des jobs process_payment", ("outcome",),
+    buckets=REMOTE_BUCKETS, store=RedisStore("metrics:payment_job_duration_seconds")))
+gateway_requests = worker_registry.register(Counter(
+    "gateway_requests_total", "Appels à la passerelle, par service et résultat", ("service", "outcome"),
+    store=RedisStore("metrics:gateway_requests_total")))
+gateway_duration = worker_registry.register(Histogram(
+    "gateway_request_duration_seconds", "Latence des appels à la passerelle", ("service",),
+    buckets=REMOTE_BUCKETS, store=RedisStore("metrics:gateway_request_duration_seconds")))
+
+
+# Début de la requête HTTP en cours (un par thread)
+_request = threading.local()
+
+
+def start_request():
+    """before_request: démarre le chronomètre de la requête."""
+    _request.start = time.perf_counter()
+
+
+def record_redis_command(command):
+    """Écouteur des commandes Redis (voir `redis_client.add_command_listener`).
+    Seules les commandes des requêtes HTTP sont comptées (pas celles des workers RQ,
+    qui importent aussi l'application)."""
+    if has_request_context():
+        redis_commands.inc(command=command)
+
+
+def record_request(response):
+    """after_request: compte la requête et observe ses durées."""
+    from flask import request
+
+    start = getattr(_request, "start", None)
+    if start is None:
+        return response
+    _request.start = None
+
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    http_requests.inc(method=request.method, route=route, status=response.status_code)
+    http_duration.observe(time.perf_counter() - start, method=request.method, route=route)
+    # Requêtes SQL comptées par le profil de la requête (voir `profiler`)
+    profile = current_profile()
+    if profile is not None:
+        http_db_queries.observe(profile.count, route=route)
+        http_db_duration.observe(profile.seconds, route=route)
+    return response
+
+
+def record_gateway_call(name, seconds, status):
+    """Écouteur du client de la passerelle (voir `gateway.add_listener`)."""
+    if status is None:
+        outcome = "network-error"
+    elif status >= 500:
+        outcome = "server-error"
+    elif status >= 400:
+        outcome = "client-error"
+    else:
+        outcome = "success"
+    gateway_requests.inc(service=name, outcome=outcome)
+    gateway_duration.observe(seconds, service=name)
@@ -14,6 +14,14 @@ class Product(BaseModel):
     in_stock = BooleanField()
     image = CharField()
 
+    class Meta:
+        # Filtres de la recherche (GET /products/search): en stock et intervalle de prix
+        # (créés par init-db; `flask sync-products` les ajoute à une base existante)
+        indexes = (
+            (("price",), False),
+            (("in_stock", "price"), False),
+        )
+
 class Order(BaseModel):
     id = AutoField()
     total_price = FloatField()
@@ -31,6 +39,12 @@ class Order(BaseModel):
     city = CharField(null=True)
     province = CharField(null=True)
 
+    # Agrégats calculés à la création. Colonnes ajoutées à une base existante par `flask serve`
+    # (au démarrage) ou `flask migrate-orders`, qui remplit aussi les anciennes commandes
+    item_count = IntegerField(null=True)
+    total_weight = IntegerField(null=True)
+    lines_summary = TextField(null=True)  # JSON: [[id, nom, prix, poids, quantité], ...]
+
 class OrderProduct(BaseModel):
     order = ForeignKeyField(Order, backref="products")
     product = ForeignKeyField(Product)
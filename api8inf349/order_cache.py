@@ -0,0 +1,250 @@
+import threading
+import time
+import uuid
+from redis.exceptions import RedisError
+from api8inf349.config import Config
+from api8inf349.json_provider import dumps_bytes
+from api8inf349.orders import load_order, load_orders, order_document
+from api8inf349.redis_client import redis_client
+
+ORDER_KEY = "order:{}"
+ORDER_VERSION_KEY = "order:{}:version"
+ORDER_LOCK_KEY = "order:{}:lock"
+
+NO_VERSION = "0"
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Regroupe les appels concurrents pour une même clé dans un processus:
+    seul le premier thread exécute `fn`, les autres attendent son résultat."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+class OrderCache:
+    """Cache Redis du document JSON `GET /order/<id>`.
+
+    - lecture: read-through, les absences concurrentes sont regroupées
+      (dans le processus, puis entre processus via un verrou Redis);
+    - écriture: chaque mutation réécrit le document et change la
+      version de la clé, ce qui annule tout remplissage concurrent basé
+      sur un état plus ancien;
+    - chaque entrée a un TTL et une taille maximale (Config.ORDER_CACHE_*).
+    """
+
+    def __init__(self):
+        self._flights = SingleFlight()
+
+    def get(self, order_id):
+        try:
+            return redis_client.get(ORDER_KEY.format(order_id))
+        except RedisError:
+            return None
+
+    def version(self, order_id):
+        """Jeton de version de la commande (NO_VERSION si aucune mutation
+        connue, None si Redis est indisponible)."""
+        try:
+            version = redis_client.get(ORDER_VERSION_KEY.format(order_id))
+        except RedisError:
+            return None
+        return version.decode() if version is not None else NO_VERSION
+
+    def fetch(self, order_id):
+        """Document JSON (bytes) de la commande, ou None si elle n'existe pas."""
+        cached = self.get(order_id)
+        if cached is not None:
+            return cached
+        return self._flights.do(order_id, lambda: self._fill(order_id))
+
+    def fetch_many(self, order_ids):
+        """Documents JSON (bytes) de plusieurs commandes: `{id: document ou None}`.
+
+        Un seul MGET (documents et versions), une lecture groupée en base pour
+        les absences, puis un remplissage en une transaction (seulement pour
+        les commandes dont la version n'a pas changé pendant le chargement).
+        """
+        keys = [ORDER_KEY.format(order_id) for order_id in order_ids]
+        version_keys = [ORDER_VERSION_KEY.format(order_id) for order_id in order_ids]
+        try:
+            values = redis_client.mget(keys + version_keys)
+        except RedisError:
+            values = None
+
+        documents = {}
+        versions = {}
+        for index, order_id in enumerate(order_ids):
+            if values is None:
+                documents[order_id] = None
+                continue
+            documents[order_id] = values[index]
+            version = values[len(order_ids) + index]
+            versions[order_id] = version.decode() if version is not None else NO_VERSION
+
+        misses = [order_id for order_id, document in documents.items() if document is None]
+        if not misses:
+            return documents
+
+        orders = load_orders(misses)
+        payloads = {order_id: dumps_bytes(order_document(order)) for order_id, order in orders.items()}
+        documents.update(payloads)
+        if versions:
+            self._store_many_if_version(payloads, orders, versions)
+        return documents
+
+    def store(self, order_id, document):
+        """Write-through: remplace le document après une mutation."""
+        payload = dumps_bytes(document)
+        ttl = Config.ORDER_CACHE_PAID_TTL if document["order"]["paid"] else Config.ORDER_CACHE_TTL
+        try:
+            pipe = redis_client.pipeline()
+            self._bump(pipe, order_id, ttl)
+            if len(payload) <= Config.ORDER_CACHE_MAX_BYTES:
+                pipe.set(ORDER_KEY.format(order_id), payload, ex=ttl)
+            else:
+                pipe.delete(ORDER_KEY.format(order_id))
+            pipe.execute()
+        except RedisError:
+            pass
+        return payload
+
+    def invalidate(self, order_id):
+        try:
+            pipe = redis_client.pipeline()
+            self._bump(pipe, order_id, Config.ORDER_CACHE_TTL)
+            pipe.delete(ORDER_KEY.format(order_id))
+            pipe.execute()
+        except RedisError:
+            pass
+
+    def _bump(self, pipe, order_id, ttl):
+        # Jeton unique plutôt qu'un compteur: une clé expirée puis recréée
+        # ne peut pas reprendre une ancienne valeur (utilisée dans les ETags).
+        # Même TTL que le document écrit: la version (ETag fort) ne survit pas au
+        # document qu'elle décrit, un document reconstruit depuis PostgreSQL
+        # (sans `credit_card`) a donc un ETag dérivé de son contenu
+        pipe.set(ORDER_VERSION_KEY.format(order_id), uuid.uuid4().hex[:16], ex=ttl)
+
+    def _fill(self, order_id):
+        lock_key = ORDER_LOCK_KEY.format(order_id)
+        token = uuid.uuid4().hex
+        try:
+            leader = redis_client.set(lock_key, token, nx=True, px=Config.ORDER_CACHE_LOCK_MS)
+        except RedisError:
+            leader = True
+
+        if not leader:
+            # Un autre processus charge déjà la commande: on attend son résultat,
+            # ou la libération du verrou sans document (commande absente, trop grosse)
+            deadline = time.monotonic() + Config.ORDER_CACHE_LOCK_MS / 1000
+            while time.monotonic() < deadline:
+                time.sleep(Config.ORDER_CACHE_POLL_MS / 1000)
+                try:
+                    cached, locked = redis_client.mget(ORDER_KEY.format(order_id), lock_key)
+                except RedisError:
+                    break
+                if cached is not None:
+                    return cached
+                if locked is None:
+                    break
+
+        try:
+            version = self.version(order_id)
+            order = load_order(order_id)
+            if order is None:
+                return None
+            payload = dumps_bytes(order_document(order))
+            if version is not None and len(payload) <= Config.ORDER_CACHE_MAX_BYTES:
+                self._store_if_version(order_id, version, payload, order.paid)
+            return payload
+        finally:
+            if leader:
+                self._release(lock_key, token)
+
+    def _store_if_version(self, order_id, version, payload, paid):
+        version_key = ORDER_VERSION_KEY.format(order_id)
+        ttl = Config.ORDER_CACHE_PAID_TTL if paid else Config.ORDER_CACHE_TTL
+
+        def store(pipe):
+            current = pipe.get(version_key)
+            if (current.decode() if current is not None else NO_VERSION) != version:
+                return  # Une mutation a eu lieu pendant le chargement
+            pipe.multi()
+            pipe.set(ORDER_KEY.format(order_id), payload, ex=ttl)
+
+        try:
+            redis_client.transaction(store, version_key)
+        except RedisError:
+            pass
+
+    def _store_many_if_version(self, payloads, orders, versions):
+        """Remplit le cache pour `payloads` (`{id: document}`), si la version lue
+        avant le chargement (`versions`) n'a pas changé."""
+        order_ids = [order_id for order_id, payload in payloads.items()
+                     if len(payload) <= Config.ORDER_CACHE_MAX_BYTES]
+        if not order_ids:
+            return
+        version_keys = [ORDER_VERSION_KEY.format(order_id) for order_id in order_ids]
+
+        def store(pipe):
+            current = pipe.mget(version_keys)
+            pipe.multi()
+            for order_id, version in zip(order_ids, current):
+                if (version.decode() if version is not None else NO_VERSION) != versions[order_id]:
+                    continue  # Une mutation a eu lieu pendant le chargement
+                ttl = Config.ORDER_CACHE_PAID_TTL if orders[order_id].paid else Config.ORDER_CACHE_TTL
+                pipe.set(ORDER_KEY.format(order_id), payloads[order_id], ex=ttl)
+
+        try:
+            redis_client.transaction(store, *version_keys)
+        except RedisError:
+            pass
+
+    def _release(self, lock_key, token):
+        def release(pipe):
+            if pipe.get(lock_key) == token.encode():
+                pipe.multi()
+                pipe.delete(lock_key)
+
+        try:
+            redis_client.transaction(release, lock_key)
+        except RedisError:
+            pass
+
+
+order_cache = OrderCache()
@@ -0,0 +1,392 @@
+import json
+from peewee import chunked, fn
+from playhouse.migrate import SchemaMigrator, migrate
+from api8inf349.catalog import catalog, CatalogProduct, PRODUCT_FIELDS
+from api8inf349.database import database
+from api8inf349.json_provider import loads_bytes
+from api8inf349.models import Product, Order, OrderProduct
+
+# Colonnes dénormalisées ajoutées à `order` (voir `add_order_columns`)
+AGGREGATE_COLUMNS = ("item_count", "total_weight", "lines_summary")
+
+# Lignes par requête `insert_many` (sous la limite de paramètres de PostgreSQL et SQLite)
+INSERT_BATCH_SIZE = 1000
+
+
+def order_summaries(before=None, limit=None, paid=None, email=None):
+    """Résumés de commandes triés par id décroissant (pagination par curseur).
+
+    `products_count` vient de `Order.item_count`; les lignes ne sont comptées
+    que pour les commandes pas encore migrées.
+    """
+    line_count = (OrderProduct
+                  .select(fn.COUNT(OrderProduct.id))
+                  .where(OrderProduct.order == Order.id))
+    query = (Order
+             .select(Order.id, Order.email, Order.total_price, Order.paid,
+                     fn.COALESCE(Order.item_count, line_count).alias("products_count"))
+             .order_by(Order.id.desc()))
+
+    if before is not None:
+        query = query.where(Order.id < before)
+    if paid is not None:
+        query = query.where(Order.paid == paid)
+    if email is not None:
+        query = query.where(Order.email == email)
+    if limit is not None:
+        query = query.limit(limit)
+
+    return list(query.dicts())
+
+
+def iter_order_summaries(batch_size, paid=None, email=None):
+    """Parcourt toutes les commandes par lots, sans tout garder en mémoire."""
+    before = None
+    while True:
+        batch = order_summaries(before=before, limit=batch_size, paid=paid, email=email)
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        before = batch[-1]["id"]
+
+
+def cart_error(code, name):
+    return {"errors": {"products": {"code": code, "name": name}}}
+
+
+def load_products(product_ids):
+    """Produits demandés, lus dans le catalogue en mémoire.
+
+    Les ids absents du catalogue (ex. synchronisation pas encore vue par ce
+    processus) sont vérifiés avec une seule requête `WHERE id IN (...)`.
+    """
+    products = catalog.get_many(product_ids)
+    missing = [product_id for product_id in product_ids if product_id not in products]
+    if missing:
+        query = Product.select(*PRODUCT_FIELDS).where(Product.id.in_(missing)).tuples()
+        products.update((row[0], CatalogProduct(*row)) for row in query)
+    return products
+
+
+def cart_quantities(data):
+    """Quantités demandées par produit: `({id: quantité}, None)` ou `(None, erreurs)`.
+
+    Supporte `products` (nouveau format) ou `product` (ancien). Les ids en
+    double sont fusionnés.
+    """
+    if isinstance(data, dict) and isinstance(data.get("products"), list):
+        products_data = data["products"]
+    elif isinstance(data, dict) and isinstance(data.get("product"), dict):
+        products_data = [data["product"]]
+    else:
+        return None, cart_error("missing-fields", "Missing or invalid 'product(s)'")
+
+    if not products_data:
+        return None, cart_error("empty", "No products provided")
+
+    quantities = {}
+    for item in products_data:
+        product_id = item.get("id") if isinstance(item, dict) else None
+        quantity = item.get("quantity", 1) if isinstance(item, dict) else None
+
+        if (not isinstance(product_id, int) or isinstance(product_id, bool) or product_id < 1
+                or not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1):
+            return None, cart_error("invalid-entry", f"Invalid product ID or quantity: {item}")
+
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities, None
+
+
+def cart_lines(quantities, products):
+    """`(lignes, None)` si tous les produits existent et sont en stock, sinon `(None, erreurs)`."""
+    for product_id in quantities:
+        product = products.get(product_id)
+        if not product or not product.in_stock:
+            return None, cart_error("not-found", f"Product ID {product_id} not found or out of stock")
+
+    return [(products[product_id], quantity) for product_id, quantity in quantities.items()], None
+
+
+def validate_cart(data):
+    """Valide un panier sans rien écrire.
+
+    Retourne `(lignes, None)` où chaque ligne est un tuple
+    `(produit, quantité)`, ou `(None, erreurs)`.
+    """
+    quantities, errors = cart_quantities(data)
+    if errors:
+        return None, errors
+    return cart_lines(quantities, load_products(list(quantities)))
+
+
+def validate_carts(carts):
+    """Valide plusieurs paniers avec une seule lecture des produits (au plus
+    une requête pour tous les ids absents du catalogue): `[(lignes, erreurs)]`."""
+    checked = [cart_quantities(data) for data in carts]
+    product_ids = {product_id for quantities, _ in checked if quantities for product_id in quantities}
+    products = load_products(list(product_ids))
+    return [(None, errors) if errors else cart_lines(quantities, products)
+            for quantities, errors in checked]
+
+
+def order_aggregates(lines):
+    """Champs dénormalisés d'une commande à partir de ses `OrderLine`."""
+    return {
+        "item_count": len(lines),
+        "total_weight": sum(line.weight * line.quantity for line in lines),
+        "lines_summary": json.dumps([
+            [line.product_id, line.name, line.price, line.weight, line.quantity] for line in lines
+        ]),
+    }
+
+
+def insert_order(lines):
+    """Crée la commande et ses lignes dans une seule transaction.
+    Retourne un `OrderSnapshot` de la commande créée."""
+    order_lines = [OrderLine(product.id, product.name, product.price, product.weight, quantity)
+                   for product, quantity in lines]
+    total_price = sum(line.price * line.quantity for line in order_lines)
+
+    with database.atomic():
+        order = Order.create(total_price=total_price, **order_aggregates(order_lines))
+        OrderProduct.insert_many([
+            {"order": order.id, "product": line.product_id, "quantity": line.quantity}
+            for line in order_lines
+        ]).execute()
+
+    return OrderSnapshot(order_lines, **order.__data__)
+
+
+def insert_orders(carts):
+    """Crée plusieurs commandes (une par liste de lignes validées) dans une
+    seule transaction, avec des `insert_many`. Retourne leurs ids, dans l'ordre."""
+    rows, carts_lines = [], []
+    for lines in carts:
+        order_lines = [OrderLine(product.id, product.name, product.price, product.weight, quantity)
+                       for product, quantity in lines]
+        rows.append({"total_price": sum(line.price * line.quantity for line in order_lines),
+                     **order_aggregates(order_lines)})
+        carts_lines.append(order_lines)
+
+    with database.atomic():
+        if database.returning_clause:
+            # PostgreSQL: une requête `INSERT ... RETURNING id` par lot
+            order_ids = []
+            for batch in chunked(rows, INSERT_BATCH_SIZE):
+                order_ids.extend(order_id for order_id, in
+                                 Order.insert_many(batch).returning(Order.id).tuples().execute())
+        else:
+            order_ids = [Order.insert(row).execute() for row in rows]
+
+        line_rows = [{"order": order_id, "product": line.product_id, "quantity": line.quantity}
+                     for order_id, order_lines in zip(order_ids, carts_lines) for line in order_lines]
+        for batch in chunked(line_rows, INSERT_BATCH_SIZE):
+            # `returning()` vide: pas de `RETURNING id` (les ids des lignes sont inutiles)
+            OrderProduct.insert_many(batch).returning().execute()
+
+    return order_ids
+
+
+def import_carts(lines, chunk_size):
+    """Import en flux: `lines` donne des `(numéro, octets)` (octets à None si la
+    ligne dépasse la taille maximale), un panier JSON par ligne.
+
+    Les paniers sont validés et insérés par lots de `chunk_size` (une lecture
+    des produits et une transaction par lot): la mémoire ne dépend pas de la
+    taille de l'import. Produit un résultat par panier, dans l'ordre:
+    `{"line": n, "order_id": id}` ou `{"line": n, "errors": {...}}`.
+    """
+    chunk = []
+    for number, line in lines:
+        if line is None:
+            chunk.append((number, None, {"errors": {"cart": {
+                "code": "too-large", "name": "Line exceeds the maximum size"}}}))
+        elif line.strip():
+            try:
+                chunk.append((number, loads_bytes(line), None))
+            except ValueError:
+                chunk.append((number, None, {"errors": {"cart": {
+                    "code": "invalid-json", "name": "Line is not a valid JSON document"}}}))
+        if len(chunk) >= chunk_size:
+            yield from _import_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from _import_chunk(chunk)
+
+
+def _import_chunk(chunk):
+    parsed = [(number, data) for number, data, errors in chunk if errors is None]
+    results = {number: errors for number, _, errors in chunk if errors is not None}
+
+    valid = []
+    for (number, data), (lines, errors) in zip(parsed, validate_carts([data for _, data in parsed])):
+        if errors:
+            results[number] = errors
+        else:
+            valid.append((number, lines))
+
+    if valid:
+        order_ids = insert_orders([lines for _, lines in valid])
+        results.update((number, {"order_id": order_id})
+                       for (number, _), order_id in zip(valid, order_ids))
+
+    for number, _, _ in chunk:
+        yield {"line": number, **results[number]}
+
+
+class OrderLine:
+    """Ligne de commande avec les champs du produit utiles à l'affichage."""
+    __slots__ = ("product_id", "name", "price", "weight", "quantity")
+
+    def __init__(self, product_id, name, price, weight, quantity):
+        self.product_id = product_id
+        self.name = name
+        self.price = price
+        self.weight = weight
+        self.quantity = quantity
+
+
+class OrderSnapshot:
+    """Copie en lecture seule d'une commande et de ses lignes."""
+    __slots__ = tuple(Order._meta.sorted_field_names) + ("lines",)
+
+    def __init__(self, lines, **fields):
+        for name in Order._meta.sorted_field_names:
+            setattr(self, name, fields.get(name))
+        self.lines = lines
+        if self.total_weight is None:
+            # Commande pas encore migrée: agrégats calculés à partir des lignes
+            self.update(**order_aggregates(lines))
+
+    def update(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @property
+    def shipping_information(self):
+        return {
+            "country": self.country,
+            "address": self.address,
+            "postal_code": self.postal_code,
+            "city": self.city,
+            "province": self.province
+        }
+
+    @property
+    def has_shipping_information(self):
+        return all(self.shipping_information.values())
+
+
+def order_lines(order_ids):
+    """Lignes (avec leur produit) de plusieurs commandes, en une requête."""
+    query = (OrderProduct
+             .select(OrderProduct.order, Product.id, Product.name, Product.price, Product.weight,
+                     OrderProduct.quantity)
+             .join(Product)
+             .where(OrderProduct.order.in_(order_ids))
+             .order_by(OrderProduct.id)
+             .tuples())
+    lines = {order_id: [] for order_id in order_ids}
+    for order_id, *line in query:
+        lines[order_id].append(OrderLine(*line))
+    return lines
+
+
+def load_order(order_id):
+    """Charge une commande et ses lignes.
+
+    Une seule lecture grâce à `lines_summary`; les commandes pas encore
+    migrées demandent une seconde requête pour les lignes.
+    Retourne None si la commande n'existe pas."""
+    return load_orders([order_id]).get(order_id)
+
+
+def load_orders(order_ids):
+    """Charge plusieurs commandes en une requête (plus une pour les lignes des
+    commandes pas encore migrées): `{id: OrderSnapshot}`, sans les absentes."""
+    rows = list(Order.select().where(Order.id.in_(order_ids)).dicts())
+    missing = [row["id"] for row in rows if row["lines_summary"] is None]
+    lines_by_order = order_lines(missing) if missing else {}
+
+    orders = {}
+    for row in rows:
+        if row["lines_summary"] is not None:
+            lines = [OrderLine(*line) for line in json.loads(row["lines_summary"])]
+        else:
+            lines = lines_by_order[row["id"]]
+        orders[row["id"]] = OrderSnapshot(lines, **row)
+    return orders
+
+
+def add_order_columns():
+    """Ajoute à la table `order` les colonnes d'agrégats absentes (nullables,
+    sans réécriture de la table). Retourne les noms des colonnes ajoutées.
+
+    À exécuter avant que le code ne serve des requêtes: chaque `Order.select()`
+    nomme ces colonnes (`flask serve` le fait au démarrage).
+    """
+    existing = {column.name for column in database.get_columns(Order._meta.table_name)}
+    missing = [name for name in AGGREGATE_COLUMNS if name not in existing]
+    if missing:
+        migrator = SchemaMigrator.from_database(database.obj)
+        migrate(*(migrator.add_column(Order._meta.table_name, name, Order._meta.fields[name])
+                  for name in missing))
+    return missing
+
+
+def backfill_order_aggregates(batch_size):
+    """Calcule les agrégats des commandes qui n'en ont pas, par lots.
+    Retourne le nombre de commandes mises à jour."""
+    updated = 0
+    while True:
+        order_ids = [order_id for order_id, in (Order
+                                                .select(Order.id)
+                                                .where(Order.lines_summary.is_null())
+                                                .order_by(Order.id)
+                                                .limit(batch_size)
+                                                .tuples())]
+        if not order_ids:
+            return updated
+
+        with database.atomic():
+            for order_id, lines in order_lines(order_ids).items():
+                Order.update(**order_aggregates(lines)).where(Order.id == order_id).execute()
+        updated += len(order_ids)
+
+
+def transaction_info(order):
+    if order.transaction_id:
+        return {"id": order.transaction_id}
+    if order.transaction_error:
+        try:
+            return json.loads(order.transaction_error)
+        except ValueError:
+            return {"error": "payment-failed", "details": order.transaction_error}
+    return {}
+
+
+def order_document(order, credit_card=None, transaction=None):
+    """Document JSON d'une commande, tel que retourné par GET /order/<id>."""
+    shipping_information = order.shipping_information
+    return {
+        "order": {
+            "id": order.id,
+            "total_price": order.total_price,
+            "total_price_tax": order.total_price_tax or 0.0,
+            "email": order.email,
+            "credit_card": credit_card or {},
+            "shipping_information": shipping_information if any(shipping_information.values()) else {},
+            "paid": order.paid,
+            "transaction": transaction if transaction is not None else transaction_info(order),
+            "products": [
+                {
+                    "id": line.product_id,
+                    "name": line.name,
+                    "quantity": line.quantity,
+                    "price": float(line.price)
+                }
+                for line in order.lines
+            ],
+            "shipping_price": order.shipping_price or 0.0
+        }
+    }
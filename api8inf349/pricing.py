@@ -0,0 +1,38 @@
+from bisect import bisect_left
+
+TAX_RATES = {"QC": 0.15, "ON": 0.13, "AB": 0.05, "BC": 0.12, "NS": 0.14}
+
+# Frais d'expédition par tranche de poids (grammes): <= 500 → 5$, <= 2000 → 10$, au-delà → 25$
+SHIPPING_WEIGHTS = [500, 2000]
+SHIPPING_PRICES = [5, 10, 25]
+
+
+def tax_rate(province):
+    return TAX_RATES.get(province, 0)
+
+
+def shipping_price(total_weight):
+    return SHIPPING_PRICES[bisect_left(SHIPPING_WEIGHTS, total_weight)]
+
+
+def quote(lines, province=None):
+    """Prix d'un panier validé (`(produit, quantité)`), sans rien écrire.
+
+    Mêmes calculs que ceux appliqués à la commande par PUT /order/<id>.
+    """
+    subtotal = sum(product.price * quantity for product, quantity in lines)
+    total_weight = sum(product.weight * quantity for product, quantity in lines)
+    tax = subtotal * tax_rate(province) if province else 0.0
+    shipping = shipping_price(total_weight)
+    return {
+        "products": [
+            {"id": product.id, "name": product.name, "quantity": quantity, "price": product.price}
+            for product, quantity in lines
+        ],
+        "province": province,
+        "total_weight": total_weight,
+        "subtotal": subtotal,
+        "tax": tax,
+        "shipping_price": shipping,
+        "total": subtotal + tax + shipping,
+    }
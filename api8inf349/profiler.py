@@ -0,0 +1,157 @@
+import functools
+import logging
+import re
+import threading
+import warnings
+from collections import Counter
+from api8inf349.config import Config
+
+logger = logging.getLogger("api8inf349.sql")
+
+# `IN (?, ?, ?)` -> `IN (?...)`: même requête normalisée quel que soit le nombre d'ids
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+# `VALUES (?...), (?...), ...` (insert_many) -> `VALUES (?...), ...`
+_VALUES_LIST = re.compile(r"(\(\?(?:\.\.\.)?\))(?:\s*,\s*\1)+")
+
+
+class NPlusOneError(RuntimeError):
+    """Même requête normalisée exécutée trop de fois pendant une requête HTTP ou un job."""
+
+
+def normalize_sql(sql):
+    sql = sql.replace("%s", "?")
+    sql = _VALUES_LIST.sub(r"\1, ...", _PLACEHOLDER_LIST.sub("(?...)", sql))
+    return " ".join(sql.split())
+
+
+def query_sql(query):
+    if isinstance(query, str):
+        return query
+    try:
+        return query.sql()[0]
+    except Exception:
+        return repr(query)
+
+
+class QueryProfile:
+    """Requêtes SQL exécutées pendant une requête HTTP ou un job."""
+    __slots__ = ("name", "count", "seconds", "queries")
+
+    def __init__(self, name, keep_queries=False):
+        self.name = name
+        self.count = 0
+        self.seconds = 0.0
+        # Requêtes conservées seulement si la détection N+1 est active
+        self.queries = [] if keep_queries else None
+
+    def add(self, query, seconds):
+        self.count += 1
+        self.seconds += seconds
+        if self.queries is not None:
+            self.queries.append((query, seconds))
+
+    def statements(self):
+        """`[(sql normalisé, secondes)]` dans l'ordre d'exécution."""
+        return [(normalize_sql(query_sql(query)), seconds) for query, seconds in self.queries or ()]
+
+    def repeated(self, threshold):
+        """Requêtes normalisées exécutées plus de `threshold` fois: `{sql: nombre}`."""
+        if self.queries is None or len(self.queries) <= threshold:
+            return {}  # aucune répétition possible: le SQL n'est pas généré
+        counts = Counter(sql for sql, _ in self.statements())
+        return {sql: count for sql, count in counts.items() if count > threshold}
+
+
+_local = threading.local()
+
+
+def current_profile():
+    return getattr(_local, "profile", None)
+
+
+def start_profile(name, keep_queries=False):
+    _local.profile = QueryProfile(name, keep_queries)
+    return _local.profile
+
+
+def stop_profile():
+    profile = current_profile()
+    _local.profile = None
+    return profile
+
+
+def record_query(query, seconds):
+    """Écouteur des requêtes SQL (voir `database.add_query_listener`)."""
+    profile = current_profile()
+    if profile is not None:
+        profile.add(query, seconds)
+    if seconds * 1000 >= Config.SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms) in %s: %s", seconds * 1000,
+                       profile.name if profile else "-", normalize_sql(query_sql(query)))
+
+
+def n_plus_one_mode(app=None):
+    """`off`, `warn` ou `raise`: SQL_N_PLUS_ONE si défini, sinon `raise` en test et `warn` en debug."""
+    if Config.SQL_N_PLUS_ONE:
+        return Config.SQL_N_PLUS_ONE
+    if app is not None and app.testing:
+        return "raise"
+    if app is not None and app.debug:
+        return "warn"
+    return "off"
+
+
+def check_n_plus_one(profile, mode):
+    if mode == "off":
+        return
+    repeated = profile.repeated(Config.N_PLUS_ONE_THRESHOLD)
+    if not repeated:
+        return
+    message = f"N+1 queries in {profile.name}: " + "; ".join(
+        f"{count}x {sql}" for sql, count in sorted(repeated.items(), key=lambda item: -item[1]))
+    if mode == "raise":
+        raise NPlusOneError(message)
+    logger.warning(message)
+    warnings.warn(message, RuntimeWarning, stacklevel=2)
+
+
+def begin_request_profile():
+    """before_request: démarre le profil SQL de la requête."""
+    from flask import current_app, request
+    start_profile(f"{request.method} {request.path}", keep_queries=n_plus_one_mode(current_app) != "off")
+
+
+def profile_response(response):
+    """after_request: en-tête `X-DB` (optionnel) et détection des requêtes N+1
+    (à la fin du flux pour les réponses en flux)."""
+    from flask import current_app
+
+    profile = current_profile()
+    if profile is None:
+        return response
+    if Config.SQL_PROFILE_HEADER:
+        response.headers["X-DB"] = f"queries={profile.count}; time_ms={profile.seconds * 1000:.3f}"
+    mode = n_plus_one_mode(current_app)
+    if response.is_streamed:
+        # Réponse en flux: ses requêtes s'exécutent après ce hook, vérifiées à la fermeture
+        response.call_on_close(functools.partial(check_n_plus_one, profile, mode))
+    else:
+        check_n_plus_one(profile, mode)
+    return response
+
+
+def end_request_profile(exc):
+    stop_profile()
+
+
+def profiled(func):
+    """Profil SQL d'une tâche (job RQ): requêtes lentes et N+1 selon SQL_N_PLUS_ONE."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = start_profile(func.__name__, keep_queries=n_plus_one_mode() != "off")
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stop_profile()
+            check_n_plus_one(profile, n_plus_one_mode())
+    return wrapper
@@ -1,6 +1,42 @@
 import os
 import redis
+from redis.client import Pipeline
+
+# Écouteurs appelés avec le nom de chaque commande envoyée (ex. métriques)
+_command_listeners = []
+
+
+def add_command_listener(listener):
+    _command_listeners.append(listener)
+
+
+def _notify(command):
+    for listener in _command_listeners:
+        listener(str(command).upper())
+
+
+class InstrumentedPipeline(Pipeline):
+    def immediate_execute_command(self, *args, **options):
+        _notify(args[0])
+        return super().immediate_execute_command(*args, **options)
+
+    def execute(self, raise_on_error=True):
+        for args, _ in self.command_stack:
+            _notify(args[0])
+        return super().execute(raise_on_error)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Client Redis qui notifie les écouteurs de chaque commande, pipelines compris."""
+
+    def execute_command(self, *args, **options):
+        _notify(args[0])
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
 
 # Utilise l'URL depuis la variable d'environnement
 redis_url = os.getenv("REDIS_URL", "redis://localhost")
-redis_client = redis.Redis.from_url(redis_url)
+redis_client = InstrumentedRedis.from_url(redis_url)
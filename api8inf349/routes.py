@@ -1,20 +1,40 @@
-from flask import jsonify, request
+from flask import jsonify, request, Response, stream_with_context
 from api8inf349 import app
+import hashlib
 import json
-import os
-import requests
+import math
+import uuid
 from rq import Queue
+from rq.exceptions import NoSuchJobError
 from rq.job import Job
 from redis.exceptions import RedisError
-from api8inf349.models import Product, Order, OrderProduct
-from api8inf349.database import database
+from api8inf349.models import Order
+from api8inf349.config import Config
+from api8inf349.catalog import catalog
+from api8inf349.search import SORTS as SEARCH_SORTS
+from api8inf349.orders import (validate_cart, insert_order, load_order, order_document,
+                               order_summaries, iter_order_summaries, import_carts)
+from api8inf349.database import database, pool_stats
 from api8inf349.redis_client import redis_client
+from api8inf349.order_cache import order_cache, NO_VERSION
+from api8inf349.events import job_event_stream, stream_slots
+from api8inf349.compression import etag_matches, matched_etag
+from api8inf349.json_provider import dumps_bytes
+from api8inf349.metrics import api_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from api8inf349.idempotency import idempotent, claim_payment, release_payment, order_update_token, is_order_update
+from api8inf349.pricing import TAX_RATES, tax_rate, shipping_price, quote
 from api8inf349.tasks import process_payment
-from flask import send_from_directory
+from api8inf349.assets import assets
+from api8inf349.images import FORMATS as IMAGE_FORMATS, image_response, parse_widths
 
 
-TAX_RATES = {"QC": 0.15, "ON": 0.13, "AB": 0.05, "BC": 0.12, "NS": 0.14}
-SHIPPING_COSTS = [(500, 5), (2000, 10), (float("inf"), 25)]
+# Connexion à la base ouverte à la demande (première requête SQL) et rendue
+# au pool à la fin de chaque requête HTTP
+@app.teardown_request
+def close_database(exc):
+    if not database.is_closed():
+        database.close()
+
 
 # @app.route("/")
 # def get_products():
@@ -22,131 +42,231 @@ SHIPPING_COSTS = [(500, 5), (2000, 10), (float("inf"), 25)]
 #     return jsonify({"products": [p.__data__ for p in products]}), 200
 
 
+def not_modified(etag, cache_control):
+    response = app.response_class(status=304)
+    response.set_etag(matched_etag(etag))
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+def with_etag(response, etag, cache_control):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
 # Get products with pagination
+# - `?page=&limit=` : pagination par numéro de page
+# - `?after=<id>&limit=` : pagination par curseur sur la clé primaire
+# L'ETag dépend seulement de la version du catalogue et des paramètres:
+# un 304 ne demande ni sérialisation ni requête SQL.
 @app.route("/")
 def get_products():
-    page = int(request.args.get("page", 1))
-    limit = int(request.args.get("limit", 10))
-    query = Product.select().paginate(page, limit)
-    total = Product.select().count()
+    limit = request.args.get("limit", Config.PRODUCTS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, Config.PRODUCTS_MAX_LIMIT))
+    after = request.args.get("after", type=int)
+    page = max(1, request.args.get("page", 1, type=int))
+
+    catalog.ensure_fresh()
+    cursor = f"after-{after}" if after is not None else f"page-{page}"
+    etag = f"catalog-{catalog.version}-{cursor}-{limit}"
+    if etag_matches(etag):
+        return not_modified(etag, Config.CATALOG_CACHE_CONTROL)
+
+    if after is not None:
+        products = catalog.after(after, limit)
+    else:
+        products = catalog.page(page, limit)
 
-    return jsonify({
-        "products": [p.__data__ for p in query],
+    response = {
+        "products": [p.to_dict() for p in products],
+        "total": len(catalog),
+        "limit": limit,
+        # Curseur de la page suivante (None si c'est la dernière)
+        "next_after": products[-1].id if len(products) == limit else None
+    }
+    if after is None:
+        response["page"] = page
+
+    return with_etag(jsonify(response), etag, Config.CATALOG_CACHE_CONTROL), 200
+
+# Search products (index inversé du catalogue en mémoire, voir `search.SearchIndex`)
+# - `?q=` : mots du nom ou de la description (le dernier peut être un préfixe)
+# - `?in_stock=true|false&min_price=&max_price=` : filtres
+# - `?sort=relevance|id|name|-name|price|-price&page=&limit=`
+@app.route("/products/search")
+def search_products():
+    errors = {}
+    in_stock = request.args.get("in_stock")
+    if in_stock is not None:
+        if in_stock.lower() not in ("true", "false", "1", "0"):
+            errors["in_stock"] = {"code": "invalid-value", "name": "'in_stock' must be true or false"}
+        in_stock = in_stock.lower() in ("true", "1")
+
+    prices = {}
+    for field in ("min_price", "max_price"):
+        value = request.args.get(field)
+        try:
+            prices[field] = float(value) if value is not None else None
+            # `nan` ne se compare à aucun prix (tout correspondrait), `inf` n'est pas un prix
+            if prices[field] is not None and not math.isfinite(prices[field]):
+                raise ValueError(value)
+        except ValueError:
+            errors[field] = {"code": "invalid-value", "name": f"'{field}' must be a number"}
+
+    sort = request.args.get("sort") or None
+    if sort is not None and sort not in SEARCH_SORTS:
+        errors["sort"] = {"code": "invalid-value", "name": f"'sort' must be one of {', '.join(SEARCH_SORTS)}"}
+    if errors:
+        return jsonify({"errors": errors}), 422
+
+    limit = request.args.get("limit", Config.PRODUCTS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, Config.PRODUCTS_MAX_LIMIT))
+    page = max(1, request.args.get("page", 1, type=int))
+
+    catalog.ensure_fresh()
+    params = hashlib.sha1(request.query_string).hexdigest()[:16]
+    etag = f"search-{catalog.version}-{params}"
+    if etag_matches(etag):
+        return not_modified(etag, Config.CATALOG_CACHE_CONTROL)
+
+    total, products = catalog.search(request.args.get("q"), in_stock, prices["min_price"], prices["max_price"],
+                                     sort, offset=(page - 1) * limit, limit=limit)
+    response = {
+        "products": [p.to_dict() for p in products],
         "total": total,
-        "page": page
-    }), 200
+        "page": page,
+        "limit": limit
+    }
+    return with_etag(jsonify(response), etag, Config.CATALOG_CACHE_CONTROL), 200
 
 @app.route("/order", methods=["POST"])
+@idempotent
 def create_order():
-    data = request.get_json()
-
-    # Supporte `products` (nouveau format) ou `product` (ancien)
-    products_data = []
-
-    if "products" in data and isinstance(data["products"], list):
-        products_data = data["products"]
-    elif "product" in data and isinstance(data["product"], dict):
-        products_data = [data["product"]]
-    else:
-        return jsonify({"errors": {"products": {
-            "code": "missing-fields",
-            "name": "Missing or invalid 'product(s)'"
-        }}}), 422
-
-    if not products_data:
-        return jsonify({"errors": {"products": {
-            "code": "empty",
-            "name": "No products provided"
-        }}}), 422
+    # Validation complète avant toute écriture (aucune commande orpheline)
+    lines, errors = validate_cart(request.get_json())
+    if errors:
+        return jsonify(errors), 422
 
-    # Création de la commande
-    order = Order.create(total_price=0)
-    total_price = 0
+    order = insert_order(lines)
+    order_cache.store(order.id, order_document(order))
 
-    for item in products_data:
-        product_id = item.get("id")
-        quantity = item.get("quantity", 1)
-
-        if not product_id or quantity < 1:
-            return jsonify({"errors": {"products": {
-                "code": "invalid-entry",
-                "name": f"Invalid product ID or quantity: {item}"
-            }}}), 422
-
-        product = Product.get_or_none(Product.id == product_id)
-        if not product or not product.in_stock:
-            return jsonify({"errors": {"products": {
-                "code": "not-found",
-                "name": f"Product ID {product_id} not found or out of stock"
-            }}}), 422
+    # return jsonify({"order_id": order.id}), 302, {"Location": f"/order/{order.id}"}
+    return jsonify({"order_id": order.id}), 201
 
-        # Ajout à la table de liaison (OrderProduct)
-        OrderProduct.create(order=order, product=product, quantity=quantity)
-        total_price += product.price * quantity
 
-    order.total_price = total_price
-    order.save()
+@app.route("/quote", methods=["POST"])
+def quote_cart():
+    # Même validation que POST /order, mais aucune écriture: le prix vient du catalogue en mémoire
+    data = request.get_json()
+    lines, errors = validate_cart(data)
+    if errors:
+        return jsonify(errors), 422
+
+    province = data.get("province")
+    if province is not None and (not isinstance(province, str) or province not in TAX_RATES):
+        return jsonify({"errors": {"province": {
+            "code": "invalid-value",
+            "name": f"Unknown province: {province}"
+        }}}), 422
 
-    # return jsonify({"order_id": order.id}), 302, {"Location": f"/order/{order.id}"}
-    return jsonify({"order_id": order.id}), 201
+    return jsonify({"quote": quote(lines, province)}), 200
 
 @app.route("/order/<int:order_id>", methods=["GET"])
 def get_order(order_id):
-    cached = redis_client.get(f"order:{order_id}")
-    if cached:
-        return jsonify(json.loads(cached)), 200
-
-    order = Order.get_or_none(Order.id == order_id)
-    if not order:
+    # ETag basé sur la version de la commande dans Redis: un 304 ne touche
+    # ni PostgreSQL ni le document
+    version = order_cache.version(order_id)
+    etag = f"order-{order_id}-{version}" if version not in (None, NO_VERSION) else None
+    if etag and etag_matches(etag):
+        return not_modified(etag, Config.ORDER_CACHE_CONTROL)
+
+    # Read-through: Redis d'abord, puis PostgreSQL (une seule fois par clé manquante)
+    document = order_cache.fetch(order_id)
+    if document is None:
         return jsonify({"errors": {"order": {"code": "not-found", "name": "Order not found"}}}), 404
 
-    product_entries = [
-        {
-            "id": op.product.id,
-            "name": op.product.name,
-            "quantity": op.quantity,
-            "price": float(op.product.price)
-        }
-        for op in order.products
-    ]
+    # Sans version connue, l'ETag est dérivé du contenu
+    etag = etag or f"order-{order_id}-{hashlib.sha1(document).hexdigest()[:16]}"
+    if etag_matches(etag):
+        return not_modified(etag, Config.ORDER_CACHE_CONTROL)
+
+    # Le JSON en cache est renvoyé tel quel, sans décodage/réencodage
+    response = app.response_class(document, mimetype="application/json")
+    return with_etag(response, etag, Config.ORDER_CACHE_CONTROL), 200
+
+
+# Lecture groupée: `GET /orders?ids=1,2,3` ou `POST /orders` avec `{"ids": [1, 2, 3]}`
+# Chaque élément a le format de GET /order/<id> (ou son erreur not-found), dans l'ordre demandé
+@app.route("/orders", methods=["GET", "POST"])
+def get_orders():
+    if request.method == "POST":
+        data = request.get_json(silent=True)
+        raw_ids = data.get("ids") if isinstance(data, dict) else None
+        # Liste d'entiers JSON seulement: une chaîne serait lue caractère par caractère, true vaudrait 1
+        if not isinstance(raw_ids, list) or any(type(value) is not int for value in raw_ids):
+            raw_ids = None
+    else:
+        raw_ids = [value for value in request.args.get("ids", "").split(",") if value.strip()]
 
-    # Préparer les données de transaction
-    transaction_data = {}
-    if order.transaction_id:
-        transaction_data = {"id": order.transaction_id}
-    elif order.transaction_error:
-        try:
-            transaction_data = json.loads(order.transaction_error)
-        except:
-            transaction_data = {"error": "payment-failed", "details": order.transaction_error}
-
-    response_data = {
-        "order": {
-            "id": order.id,
-            "total_price": order.total_price,
-            "total_price_tax": order.total_price_tax or 0.0,
-            "email": order.email,
-            "credit_card": {},
-            "shipping_information": {
-                "country": order.country,
-                "address": order.address,
-                "postal_code": order.postal_code,
-                "city": order.city,
-                "province": order.province
-            } if any([order.country, order.address, order.postal_code, order.city, order.province]) else {},
-            "paid": order.paid,
-            "transaction": transaction_data,
-            "products": product_entries,
-            "shipping_price": order.shipping_price or 0.0
-        }
-    }
+    try:
+        order_ids = list(dict.fromkeys(int(value) for value in raw_ids))
+    except (TypeError, ValueError):
+        order_ids = None
+    if not order_ids or len(order_ids) > Config.ORDERS_LOOKUP_MAX:
+        return jsonify({"errors": {"ids": {
+            "code": "invalid-value",
+            "name": f"'ids' must list between 1 and {Config.ORDERS_LOOKUP_MAX} order ids"
+        }}}), 422
 
-    return jsonify(response_data), 200
+    # Un MGET pour les documents en cache, une lecture groupée pour les autres
+    documents = order_cache.fetch_many(order_ids)
+    entries = [
+        documents[order_id] if documents[order_id] is not None else dumps_bytes({
+            "id": order_id,
+            "errors": {"order": {"code": "not-found", "name": "Order not found"}}
+        })
+        for order_id in order_ids
+    ]
+    # Les documents en cache sont assemblés tels quels, sans décodage/réencodage
+    response = app.response_class(b'{"orders":[' + b",".join(entries) + b"]}", mimetype="application/json")
+    response.headers["Cache-Control"] = Config.ORDER_CACHE_CONTROL
+    return response, 200
+
+
+def ndjson_lines(stream, max_bytes):
+    """`(numéro, octets)` de chaque ligne du corps, lue au fil de l'eau.
+    Une ligne de plus de `max_bytes` est ignorée jusqu'à sa fin (octets à None)."""
+    number = 0
+    while True:
+        line = stream.readline(max_bytes + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_bytes and not line.endswith(b"\n"):
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_bytes)
+            yield number, None
+        else:
+            yield number, line
+
+
+# Import en flux: un panier JSON par ligne (NDJSON), même format que POST /order
+# Réponse NDJSON: une ligne par panier, `{"line": n, "order_id": id}` ou `{"line": n, "errors": {...}}`
+# Chaque lot de ORDERS_BULK_CHUNK paniers est inséré dans sa propre transaction
+@app.route("/orders/bulk", methods=["POST"])
+def import_orders():
+    def generate():
+        for result in import_carts(ndjson_lines(request.stream, Config.ORDERS_BULK_MAX_LINE),
+                                   Config.ORDERS_BULK_CHUNK):
+            yield dumps_bytes(result) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 
 @app.route("/order/<int:order_id>", methods=["PUT"])
+@idempotent
 def update_order_and_pay(order_id):
-    order = Order.get_or_none(Order.id == order_id)
+    order = load_order(order_id)
     if not order:
         return jsonify({"errors": {"order": {"code": "not-found", "name": "Order not found"}}}), 404
 
@@ -178,25 +298,53 @@ def update_order_and_pay(order_id):
                 "name": "Shipping info & email required"
             }}}), 422
 
-        order.email = email
-        order.country = shipping_info["country"]
-        order.address = shipping_info["address"]
-        order.postal_code = shipping_info["postal_code"]
-        order.city = shipping_info["city"]
-        order.province = shipping_info["province"]
+        rate = tax_rate(shipping_info["province"])
+        # Poids dénormalisé sur la commande (`Order.total_weight`)
+        total_weight = order.total_weight
+
+        fields = {
+            "email": email,
+            "country": shipping_info["country"],
+            "address": shipping_info["address"],
+            "postal_code": shipping_info["postal_code"],
+            "city": shipping_info["city"],
+            "province": shipping_info["province"],
+            "total_price_tax": order.total_price * (1 + rate),
+            "shipping_price": shipping_price(total_weight)
+        }
 
-        tax_rate = TAX_RATES.get(order.province, 0)
-        order.total_price_tax = order.total_price * (1 + tax_rate)
+        # Le montant envoyé à la passerelle dépend de l'expédition: l'écriture se fait
+        # sous le verrou du paiement (refusée pendant un paiement, et aucun paiement ne
+        # démarre avant la fin de l'écriture)
+        token = order_update_token()
+        try:
+            running = claim_payment(order.id, token)
+        except RedisError:
+            token = running = None  # Sans Redis, aucun paiement ne peut être mis en file
+        if running is not None:
+            return jsonify({"errors": {"order": {
+                "code": "update-in-progress" if is_order_update(running) else "payment-in-progress",
+                "name": "The order is being updated or paid"
+            }}}), 409
 
-        total_weight = sum(op.product.weight * op.quantity for op in order.products)
-        order.shipping_price = next(price for max_weight, price in SHIPPING_COSTS if total_weight <= max_weight)
+        try:
+            # Conditionnelle: un paiement terminé depuis la lecture de la commande l'emporte
+            updated = Order.update(**fields).where((Order.id == order.id) & (Order.paid == False)).execute()
+            if not updated:
+                return jsonify({"errors": {"order": {"code": "already-paid", "name": "Order is already paid and cannot be modified"}}}), 409
+            order.update(**fields)
 
-        order.save()
+            document = order_document(order)
+            payload = order_cache.store(order.id, document)
+        finally:
+            if token is not None:
+                release_payment(order.id, token)
 
-        return get_order(order.id)  # Réutilise le format de GET
+        # Même format que GET, déjà sérialisé pour le cache
+        return app.response_class(payload, mimetype="application/json"), 200
 
     if is_payment:
-        if not order.email or not all([order.country, order.address, order.postal_code, order.city, order.province]):
+        if not order.email or not order.has_shipping_information:
             return jsonify({"errors": {"order": {
                 "code": "missing-fields",
                 "name": "Order must have email and shipping information before payment"
@@ -221,14 +369,41 @@ def update_order_and_pay(order_id):
             "amount_charged": order.total_price_tax + order.shipping_price
         }
 
-        q = Queue(connection=redis_client)
-        job = q.enqueue(
+        # Un seul paiement en cours par commande: un double clic ou une nouvelle
+        # tentative du client reçoit le job déjà lancé. Le job est enregistré
+        # avant que son id n'apparaisse dans le verrou: un verrou dont le job est
+        # introuvable est donc réellement abandonné
+        q = Queue(Config.PAYMENTS_QUEUE, connection=redis_client)
+        job = q.create_job(
             process_payment,
-            order.id,
-            payment_data,
-            credit_card,
-            "https://dimensweb.uqac.ca/~jgnault/shops/pay/"
+            args=(order.id, payment_data, credit_card, Config.PAYMENT_URL),
+            job_id=str(uuid.uuid4())
         )
+        job.save()
+
+        running = claim_payment(order.id, job.id)
+        if running is not None and is_order_update(running):
+            job.delete()
+            return jsonify({"errors": {"order": {
+                "code": "update-in-progress",
+                "name": "Shipping information is being updated, retry the payment"
+            }}}), 409
+        if running is not None and not payment_job_active(running):
+            # Verrou laissé par un job qui ne l'a pas libéré (worker arrêté brutalement)
+            release_payment(order.id, running)
+            running = claim_payment(order.id, job.id)
+        if running is not None:
+            job.delete()
+            return jsonify({
+                "message": "Payment already in progress",
+                "job_id": running
+            }), 202
+
+        try:
+            q.enqueue_job(job)
+        except Exception:
+            release_payment(order.id, job.id)
+            raise
 
         return jsonify({
             "message": "Payment processing started",
@@ -237,6 +412,14 @@ def update_order_and_pay(order_id):
 
     return jsonify({"errors": {"order": {"code": "invalid-request", "name": "Invalid request format"}}}), 400
 
+def payment_job_active(job_id):
+    try:
+        job = Job.fetch(job_id, connection=redis_client)
+    except NoSuchJobError:
+        return False
+    return job.get_status() in ("queued", "started", "deferred", "scheduled")
+
+
 @app.route("/job/<job_id>", methods=["GET"])
 def get_job_status(job_id):
     try:
@@ -246,40 +429,121 @@ def get_job_status(job_id):
     except Exception:
         return jsonify({"error": "Job not found"}), 404
 
-    response = {
+    response = jsonify(job_state(job))
+    response.headers["Cache-Control"] = "no-store"
+    return response, 200
+
+def job_state(job):
+    state = {
         "id": job.id,
         "status": job.get_status(),
         "result": job.result if job.is_finished else None
     }
+    # Document final de la commande, pour éviter un second appel à /order/<id>
+    if state["status"] == "finished" and job.args:
+        document = order_cache.fetch(job.args[0])
+        if document is not None:
+            state["order"] = json.loads(document)["order"]
+    return state
+
+@app.route("/job/<job_id>/events", methods=["GET"])
+def get_job_events(job_id):
+    # Sans support SSE, même réponse que le polling classique
+    if "text/event-stream" not in request.accept_mimetypes.values():
+        return get_job_status(job_id)
+
+    try:
+        job = Job.fetch(job_id, connection=redis_client)
+    except RedisError:
+        return jsonify({"error": "Redis unavailable"}), 503
+    except Exception:
+        return jsonify({"error": "Job not found"}), 404
 
-    return jsonify(response), 200
+    # Trop de flux ouverts dans ce processus: réponse de polling (EventSource
+    # la refuse et le frontend repasse en polling)
+    if not stream_slots.acquire(Config.SSE_MAX_STREAMS):
+        return get_job_status(job_id)
+
+    def current_state():
+        job.refresh()
+        return job_state(job)
+
+    stream = job_event_stream(job_id, current_state, Config.SSE_MAX_DURATION, Config.SSE_HEARTBEAT)
+    response = Response(stream_with_context(stream), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Libéré à la fermeture de la réponse, même si le flux n'a jamais été lu
+    response.call_on_close(stream_slots.release)
+    return response
 
 # additional method
+# - `?before=<id>&limit=` : pagination par curseur (id décroissant)
+# - `?paid=true|false&email=` : filtres
+# - `?format=ndjson` (ou `Accept: application/x-ndjson`) : export complet en flux
 @app.route("/order", methods=["GET"])
 def list_orders():
-    orders = Order.select().order_by(Order.id.desc())
+    paid = request.args.get("paid")
+    if paid is not None:
+        if paid.lower() not in ("true", "false", "1", "0"):
+            return jsonify({"errors": {"paid": {
+                "code": "invalid-value",
+                "name": "'paid' must be true or false"
+            }}}), 422
+        paid = paid.lower() in ("true", "1")
+    email = request.args.get("email") or None
 
-    response = {
-        "orders": []
-    }
+    ndjson = (request.args.get("format") == "ndjson"
+              or request.accept_mimetypes.best == "application/x-ndjson")
+    if ndjson:
+        def generate():
+            for summary in iter_order_summaries(Config.ORDERS_EXPORT_BATCH, paid=paid, email=email):
+                yield dumps_bytes(summary) + b"\n"
 
-    for order in orders:
-        response["orders"].append({
-            "id": order.id,
-            "email": order.email,
-            "total_price": order.total_price,
-            "paid": order.paid,
-            "products_count": order.products.count()
-        })
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    limit = request.args.get("limit", Config.ORDERS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, Config.ORDERS_MAX_LIMIT))
+    before = request.args.get("before", type=int)
+
+    orders = order_summaries(before=before, limit=limit, paid=paid, email=email)
 
-    return jsonify(response), 200
+    return jsonify({
+        "orders": orders,
+        "limit": limit,
+        # Curseur de la page suivante (None si c'est la dernière)
+        "next_before": orders[-1]["id"] if len(orders) == limit else None
+    }), 200
+
+@app.route("/stats/db", methods=["GET"])
+def get_db_stats():
+    # Statistiques du pool de ce processus (in use / idle / temps d'attente)
+    return jsonify({"pool": pool_stats()}), 200
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    # Format texte Prometheus: métriques de ce processus et files RQ
+    return Response(api_registry.render(), content_type=METRICS_CONTENT_TYPE)
 
 @app.route("/frontend/<path:path>")
 def serve_frontend(path):
-    frontend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
-    return send_from_directory(frontend_dir, path)
+    # Manifeste construit au démarrage: ETag = empreinte, gzip précalculé
+    return assets.response(path)
 
+# - `?w=<largeur>` (parmi IMAGE_WIDTHS) et/ou `?fmt=jpeg|webp|png` : dérivé mis en cache sur disque
 @app.route("/img/<filename>")
 def serve_image(filename):
-    image_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "static", "img")
-    return send_from_directory(image_dir, filename)
+    width = request.args.get("w")
+    fmt = request.args.get("fmt")
+    if width is None and fmt is None:
+        return assets.response(f"static/img/{filename}")
+
+    if width is not None and (not width.isdigit() or int(width) not in parse_widths(Config.IMAGE_WIDTHS)):
+        return jsonify({"errors": {"w": {
+            "code": "invalid-value",
+            "name": f"'w' must be one of {Config.IMAGE_WIDTHS}"
+        }}}), 422
+    if fmt is not None and fmt not in IMAGE_FORMATS:
+        return jsonify({"errors": {"fmt": {
+            "code": "invalid-value",
+            "name": f"'fmt' must be one of {', '.join(IMAGE_FORMATS)}"
+        }}}), 422
+    return image_response(f"static/img/{filename}", int(width) if width else None, fmt)
@@ -1,8 +1,13 @@
 from rq import SimpleWorker, Queue
+from api8inf349.config import Config
 from api8inf349.redis_client import redis_client
 
 if __name__ == "__main__":
-    queue = Queue(connection=redis_client)
-    worker = SimpleWorker([queue], connection=redis_client)
+    # Un seul worker qui écoute toutes les files, par ordre de priorité
+    queues = [
+        Queue(name, connection=redis_client)
+        for name in (Config.PAYMENTS_QUEUE, "default", Config.MAINTENANCE_QUEUE)
+    ]
+    worker = SimpleWorker(queues, connection=redis_client)
     print("🚀 SimpleWorker started (no fork, Windows-compatible)")
     worker.work()
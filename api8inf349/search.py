@@ -0,0 +1,125 @@
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Poids d'un mot selon le champ où il apparaît (pertinence)
+NAME_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+# Tris acceptés par GET /products/search (`-` : décroissant)
+SORTS = ("relevance", "id", "name", "-name", "price", "-price")
+
+
+def tokenize(text):
+    """Mots en minuscules, sans accents: `"Œufs bruns"` -> `["oeufs", "bruns"]`."""
+    text = (text or "").lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text.replace("œ", "oe").replace("æ", "ae"))
+        text = text.encode("ascii", "ignore").decode()
+    return _TOKEN.findall(text)
+
+
+class SearchIndex:
+    """Index inversé du catalogue en mémoire, construit à chaque rechargement.
+
+    - mot -> `{id: poids}` (nom ou description), vocabulaire trié pour la
+      recherche par préfixe du dernier mot (recherche pendant la saisie);
+    - `(prix, id)` triés pour les intervalles de prix, ids en stock;
+    - rang de chaque produit pour les tris par nom et par prix.
+    """
+
+    def __init__(self, products):
+        self.products = {product.id: product for product in products}
+        self.ids = sorted(self.products)
+        self.postings = postings = {}
+        self.in_stock = set()
+        by_price = []
+        for product in products:
+            if product.in_stock:
+                self.in_stock.add(product.id)
+            by_price.append((product.price, product.id))
+            for token in tokenize(product.name):
+                postings.setdefault(token, {})[product.id] = NAME_WEIGHT
+            for token in tokenize(product.description):
+                postings.setdefault(token, {}).setdefault(product.id, DESCRIPTION_WEIGHT)
+
+        self.vocabulary = sorted(self.postings)
+        by_price.sort()
+        self.prices = [price for price, _ in by_price]
+        self.price_ids = [product_id for _, product_id in by_price]
+        self.ranks = {
+            "id": {product_id: rank for rank, product_id in enumerate(self.ids)},
+            "price": {product_id: rank for rank, product_id in enumerate(self.price_ids)},
+            "name": {product.id: rank for rank, product in enumerate(
+                sorted(products, key=lambda product: (product.name.lower(), product.id)))},
+        }
+
+    def _prefix(self, prefix):
+        """`{id: poids}` des mots commençant par `prefix` (à ne pas modifier)."""
+        start = bisect_left(self.vocabulary, prefix)
+        tokens = self.vocabulary[start:bisect_right(self.vocabulary, prefix + "\uffff")]
+        if len(tokens) == 1:
+            return self.postings[tokens[0]]
+        scores = {}
+        for token in tokens:
+            for product_id, weight in self.postings[token].items():
+                scores[product_id] = max(scores.get(product_id, 0), weight)
+        return scores
+
+    def search(self, query=None, in_stock=None, min_price=None, max_price=None, sort=None,
+               offset=0, limit=None):
+        """`(nombre de résultats, produits de la page)`, triés (`relevance` par défaut si `query`).
+
+        Seule la page demandée est triée (`heapq`), pas l'ensemble des résultats.
+        """
+        scores = None
+        tokens = tokenize(query)
+        for index, token in enumerate(tokens):
+            # Le dernier mot peut être incomplet: recherche par préfixe
+            matches = self._prefix(token) if index == len(tokens) - 1 else self.postings.get(token, {})
+            if scores is None:
+                scores = matches
+            else:
+                scores = {pid: score + matches[pid] for pid, score in scores.items() if pid in matches}
+            if not scores:
+                return 0, []
+
+        # `order`: tri déjà respecté par `ids` (la page est alors un simple découpage)
+        if min_price is not None or max_price is not None:
+            start = bisect_left(self.prices, min_price) if min_price is not None else 0
+            end = bisect_right(self.prices, max_price) if max_price is not None else len(self.prices)
+            ids, order = self.price_ids[start:end], "price"
+            if scores is not None:
+                ids = [pid for pid in ids if pid in scores]
+        elif scores is not None:
+            ids, order = list(scores), None
+        else:
+            ids, order = self.ids, "id"
+
+        if in_stock is not None:
+            ids = [pid for pid in ids if (pid in self.in_stock) == in_stock]
+
+        sort = sort or ("relevance" if scores is not None else "id")
+        if sort == "relevance" and scores is None:
+            sort = "id"
+        end = offset + limit if limit is not None else len(ids)
+
+        if sort == order:
+            page = ids[offset:end]
+        elif sort == f"-{order}":
+            count = len(ids)
+            page = ids[max(0, count - end):max(0, count - offset)][::-1]
+        else:
+            if sort == "relevance":
+                rank = self.ranks["id"]
+                key = lambda pid: (-scores[pid], rank[pid])
+            elif sort.startswith("-"):
+                rank = self.ranks[sort[1:]]
+                key = lambda pid: -rank[pid]
+            else:
+                key = self.ranks[sort].__getitem__
+            page = heapq.nsmallest(end, ids, key=key)[offset:]
+        return len(ids), [self.products[pid] for pid in page]
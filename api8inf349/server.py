@@ -0,0 +1,112 @@
+import logging
+from peewee import PeeweeException
+from playhouse.pool import PooledDatabase
+from redis.exceptions import RedisError
+from api8inf349 import redis_client as redis_module
+from api8inf349.catalog import catalog
+from api8inf349.config import Config
+from api8inf349.database import database
+from api8inf349.gateway import gateway
+from api8inf349.metrics import discard_pending_metrics
+from api8inf349.orders import add_order_columns
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn est optionnel (Unix seulement): `flask serve` est alors indisponible
+    BaseApplication = None
+
+logger = logging.getLogger("api8inf349.server")
+
+
+def release_connections():
+    """Processus maître, avant un fork: ferme les connexions ouvertes pendant le
+    préchargement pour qu'aucun socket ne soit partagé avec les enfants."""
+    if not database.is_closed():
+        database.close()
+    if isinstance(database.obj, PooledDatabase):
+        database.obj.close_all()
+    redis_module.redis_client.connection_pool.disconnect()
+    gateway.reset()
+
+
+def reinit_after_fork():
+    """Processus enfant, après un fork: repart d'un pool SQL, d'un pool Redis et
+    d'une session HTTP vides (sans fermer les connexions héritées du parent)."""
+    database.obj._state.reset()
+    if isinstance(database.obj, PooledDatabase):
+        database.obj._connections = []
+        database.obj._in_use = {}
+    redis_module.redis_client.connection_pool.reset()
+    gateway.reset()
+    discard_pending_metrics()
+
+
+def warm_up(app):
+    """Processus maître, au démarrage: ajoute les colonnes d'agrégats des
+    commandes si elles manquent, puis charge le catalogue (les enfants en
+    héritent, copie sur écriture)."""
+    try:
+        with app.app_context():
+            added = add_order_columns()
+            if added:
+                logger.warning("Columns added to order: %s (flask migrate-orders fills them)", ", ".join(added))
+    except PeeweeException as error:
+        logger.error("Order columns not checked (%s): run flask migrate-orders", error)
+    try:
+        with app.app_context():
+            catalog.ensure_fresh()
+    except (PeeweeException, RedisError) as error:
+        logger.warning("Catalog not preloaded (%s), workers will load it on first use", error)
+    finally:
+        release_connections()
+
+
+def server_options(**overrides):
+    """Options gunicorn lues dans Config (variables d'environnement SERVER_*)."""
+    options = {
+        "bind": Config.SERVER_BIND,
+        "workers": Config.SERVER_WORKERS,
+        "threads": Config.SERVER_THREADS,
+        "timeout": Config.SERVER_TIMEOUT,
+        "graceful_timeout": Config.SERVER_GRACEFUL_TIMEOUT,
+        "keepalive": Config.SERVER_KEEPALIVE,
+        "max_requests": Config.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": Config.SERVER_MAX_REQUESTS_JITTER,
+        "preload_app": True,
+        "pre_fork": lambda server, worker: release_connections(),
+        "post_fork": lambda server, worker: reinit_after_fork(),
+    }
+    options.update({key: value for key, value in overrides.items() if value is not None})
+    # Plusieurs threads par processus: worker gthread (sinon gunicorn reste en sync)
+    options["worker_class"] = "gthread" if options["threads"] > 1 else "sync"
+    return options
+
+
+if BaseApplication is not None:
+    class Server(BaseApplication):
+        """Serveur gunicorn: l'application est importée une fois dans le maître,
+        puis chaque processus enfant recrée ses connexions après le fork.
+
+        - SIGHUP: relit la configuration et remplace les processus un à un;
+        - SIGTERM: arrêt à chaud (les requêtes en cours se terminent, jusqu'à
+          `graceful_timeout`).
+        """
+
+        def __init__(self, app, options):
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            warm_up(self.application)
+            return self.application
+else:
+    Server = None
+
+
+def serve(app, **overrides):
+    Server(app, server_options(**overrides)).run()
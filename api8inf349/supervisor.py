@@ -0,0 +1,193 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rq import Queue, SimpleWorker, Worker
+from api8inf349.config import Config
+from api8inf349.metrics import Gauge, Registry, worker_registry, CONTENT_TYPE
+from api8inf349.redis_client import redis_client
+
+logger = logging.getLogger("api8inf349.supervisor")
+
+
+def parse_pools(spec):
+    """`"payments,default:2;maintenance:1"` -> `[(["payments", "default"], 2), (["maintenance"], 1)]`.
+
+    Chaque groupe liste ses files par ordre de priorité, suivi du nombre de
+    processus à démarrer.
+    """
+    pools = []
+    for group in filter(None, (part.strip() for part in spec.split(";"))):
+        queues, _, count = group.partition(":")
+        names = [name.strip() for name in queues.split(",") if name.strip()]
+        if names:
+            pools.append((names, int(count or 1)))
+    return pools
+
+
+def run_worker(queue_names, name):
+    """Point d'entrée d'un processus enfant: un SimpleWorker sur ses files."""
+    # Les signaux sont gérés par RQ (arrêt à chaud: le job en cours se termine)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    queues = [Queue(queue_name, connection=redis_client) for queue_name in queue_names]
+    worker = SimpleWorker(queues, name=name, connection=redis_client)
+    worker.work()
+
+
+class WorkerSupervisor:
+    """Démarre et surveille N processus worker RQ.
+
+    - redémarre les enfants qui se terminent de façon inattendue;
+    - SIGTERM/SIGINT: transmet SIGTERM aux enfants et attend la fin des
+      jobs en cours (jusqu'à `drain_timeout`), puis force l'arrêt;
+    - publie périodiquement le nombre de workers occupés/inactifs.
+    """
+
+    def __init__(self, pools, drain_timeout=None, report_interval=None):
+        self.pools = pools
+        self.drain_timeout = drain_timeout if drain_timeout is not None else Config.WORKER_DRAIN_TIMEOUT
+        self.report_interval = report_interval if report_interval is not None else Config.WORKER_REPORT_INTERVAL
+        self.prefix = f"{socket.gethostname()}.{os.getpid()}"
+        self.children = {}  # nom du worker -> (index du groupe, processus)
+        self.started_at = {}
+        self.pending = {}  # redémarrages différés: nom -> (index du groupe, échéance)
+        self.restarts = 0
+        self._stopping = False
+
+    def start(self):
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        for index, (queue_names, count) in enumerate(self.pools):
+            for slot in range(count):
+                self._spawn(index, slot)
+
+        logger.info("Supervisor started: %s", ", ".join(
+            f"{count}x[{', '.join(queue_names)}]" for queue_names, count in self.pools))
+        try:
+            self._monitor()
+        finally:
+            self._drain()
+
+    def _request_stop(self, signum, frame):
+        logger.info("Signal %s received, draining workers", signum)
+        self._stopping = True
+
+    def _spawn(self, index, slot):
+        queue_names = self.pools[index][0]
+        name = f"{self.prefix}.{index}.{slot}"
+        process = multiprocessing.Process(target=run_worker, args=(queue_names, name), name=name)
+        process.start()
+        self.children[name] = (index, process)
+        self.started_at[name] = time.monotonic()
+
+    def _monitor(self):
+        last_report = 0.0
+        while not self._stopping:
+            for name, (index, process) in list(self.children.items()):
+                if process.is_alive():
+                    continue
+                process.join()
+                del self.children[name]
+                # Un enfant qui plante dès son démarrage est relancé avec un délai
+                lifetime = time.monotonic() - self.started_at.pop(name)
+                delay = Config.WORKER_RESTART_DELAY if lifetime < Config.WORKER_RESTART_DELAY else 0
+                logger.warning("Worker %s exited with code %s, restarting in %ss", name, process.exitcode, delay)
+                self.pending[name] = (index, time.monotonic() + delay)
+
+            for name, (index, due) in list(self.pending.items()):
+                if time.monotonic() >= due:
+                    del self.pending[name]
+                    self.restarts += 1
+                    self._spawn(index, int(name.rsplit(".", 1)[1]))
+
+            if time.monotonic() - last_report >= self.report_interval:
+                last_report = time.monotonic()
+                logger.info("Workers: %s", self.status())
+            time.sleep(1)
+
+    def _drain(self):
+        for name, (_, process) in self.children.items():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.drain_timeout
+        for name, (_, process) in self.children.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Worker %s did not finish in time, killing it", name)
+                process.kill()
+                process.join()
+        self.children.clear()
+        logger.info("All workers stopped")
+
+    def status(self):
+        """Nombre de workers occupés/inactifs et profondeur des files, par groupe."""
+        states = {
+            worker.name: worker.get_state()
+            for worker in Worker.all(connection=redis_client)
+            if worker.name.startswith(self.prefix + ".")
+        }
+        report = []
+        for index, (queue_names, count) in enumerate(self.pools):
+            names = [name for name, (pool, _) in list(self.children.items()) if pool == index]
+            busy = sum(1 for name in names if states.get(name) == "busy")
+            report.append({
+                "queues": queue_names,
+                "processes": len(names),
+                "busy": busy,
+                "idle": len(names) - busy,
+                "queued": {name: Queue(name, connection=redis_client).count for name in queue_names}
+            })
+        return {"pools": report, "restarts": self.restarts}
+
+def supervisor_metrics(supervisor):
+    """Métriques des workers (stockées dans Redis) et état courant des processus."""
+    status = supervisor.status()
+    pools = [(", ".join(pool["queues"]), pool) for pool in status["pools"]]
+
+    registry = Registry()
+    registry.register(Gauge("worker_processes", "Processus worker par groupe de files et état",
+                            ("queues", "state"),
+                            lambda: [({"queues": queues, "state": state}, pool[state])
+                                     for queues, pool in pools for state in ("busy", "idle")]))
+    registry.register(Gauge("worker_restarts", "Redémarrages de workers depuis le lancement du superviseur",
+                            (), lambda: [({}, status["restarts"])]))
+    return worker_registry.render() + registry.render()
+
+
+def serve_metrics(supervisor, port):
+    """Exporteur HTTP (`GET /metrics`) lancé dans un thread du superviseur."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = supervisor_metrics(supervisor).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    logger.info("Metrics exporter listening on :%s", port)
+    return server
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    supervisor = WorkerSupervisor(parse_pools(Config.WORKER_POOLS))
+    if Config.WORKER_METRICS_PORT:
+        serve_metrics(supervisor, Config.WORKER_METRICS_PORT)
+    supervisor.start()
@@ -1,14 +1,67 @@
 import json
-import requests
+import time
+from rq import get_current_job
+from api8inf349.database import with_connection
+from api8inf349.events import publish_job_event
+from api8inf349.gateway import gateway
+from api8inf349.idempotency import own_payment, release_payment
+from api8inf349.metrics import payment_jobs, payment_duration, record_gateway_call
 from api8inf349.models import Order
-from api8inf349.redis_client import redis_client
+from api8inf349.orders import load_order, order_document
+from api8inf349.order_cache import order_cache
+from api8inf349.profiler import profiled
 
+gateway.add_listener(record_gateway_call)
 
+
+@profiled
+@with_connection
 def process_payment(order_id, payment_data, credit_card, transaction_url):
-    order = Order.get_by_id(order_id)
+    job = get_current_job()
+    job_id = job.id if job else None
 
+    start = time.monotonic()
+    outcome = "exception"
     try:
-        response = requests.post(transaction_url, json=payment_data, headers={"Content-Type": "application/json"})
+        result = charge_order(job_id, order_id, payment_data, credit_card, transaction_url)
+        outcome = "success" if result.get("success") else result.get("error", "failed")
+        return result
+    finally:
+        # Un nouveau paiement redevient possible (ex. après un refus de la passerelle)
+        if job_id:
+            release_payment(order_id, job_id)
+        payment_jobs.inc(outcome=outcome)
+        payment_duration.observe(time.monotonic() - start, outcome=outcome)
+
+
+def charge_order(job_id, order_id, payment_data, credit_card, transaction_url):
+    if job_id and not own_payment(order_id, job_id):
+        # Réservation détenue par un autre job: un seul appel à la passerelle par commande
+        result = {"error": "payment-in-progress", "order_id": order_id}
+        publish_job_event(job_id, "finished", result=result)
+        return result
+
+    # Lue après la réservation: plus aucune mise à jour de l'expédition n'est acceptée
+    order = load_order(order_id)
+    if order is None:
+        result = {"error": "order-not-found", "order_id": order_id}
+        publish_job_event(job_id, "finished", result=result)
+        return result
+
+    if order.paid:
+        # Déjà payée par un autre job: la passerelle n'est pas rappelée
+        result = {"error": "already-paid", "order_id": order_id}
+        publish_job_event(job_id, "finished", result=result)
+        return result
+
+    publish_job_event(job_id, "started")
+    # Montant recalculé depuis la commande lue sous réservation (et non celle vue par la route)
+    payment_data = dict(payment_data, amount_charged=order.total_price_tax + order.shipping_price)
+
+    try:
+        # POST non idempotent: pas de nouvelle tentative après l'envoi
+        response = gateway.post(transaction_url, name="payment", json=payment_data,
+                                headers={"Content-Type": "application/json"})
 
         # Traitement de la réponse
         payment_response = {}
@@ -19,86 +72,60 @@ def process_payment(order_id, payment_data, credit_card, transaction_url):
             # Erreur du service de paiement distant
             try:
                 error_info = response.json()
-            except:
+            except ValueError:
                 error_info = {"error": "payment-failed", "details": response.text}
 
             # Persister l'erreur dans la base de données
-            order.transaction_error = json.dumps(error_info)
-            order.save()
+            fields = {"transaction_error": json.dumps(error_info)}
         else:
             # Paiement réussi
             payment_response = response.json()
-            order.paid = True
-            order.transaction_id = payment_response["transaction"]["id"]
-            order.transaction_error = None
-            order.save()
+            fields = {
+                "paid": True,
+                "transaction_id": payment_response["transaction"]["id"],
+                "transaction_error": None
+            }
+
+        Order.update(**fields).where(Order.id == order.id).execute()
+        order.update(**fields)
 
         # Préparer les données de réponse
         first_digits = credit_card["number"][:4]
         last_digits = credit_card["number"][-4:]
 
-        product_entries = [
-            {
-                "id": op.product.id,
-                "name": op.product.name,
-                "quantity": op.quantity,
-                "price": float(op.product.price),
-                "weight": op.product.weight,
-                "height": op.product.height
-            }
-            for op in order.products
-        ]
-
         # Structure de la transaction en fonction du succès ou de l'échec
-        transaction_data = {}
-        if order.paid:
-            transaction_data = payment_response["transaction"]
-        elif order.transaction_error:
-            try:
-                transaction_data = json.loads(order.transaction_error)
-            except:
-                transaction_data = {"error": "payment-failed", "details": order.transaction_error}
-
-        response_data = {
-            "order": {
-                "id": order.id,
-                "total_price": order.total_price,
-                "total_price_tax": order.total_price_tax,
-                "email": order.email,
-                "credit_card": {
-                    "name": credit_card["name"],
-                    "first_digits": first_digits,
-                    "last_digits": last_digits,
-                    "expiration_year": credit_card["expiration_year"],
-                    "expiration_month": credit_card["expiration_month"]
-                },
-                "shipping_information": {
-                    "country": order.country,
-                    "address": order.address,
-                    "postal_code": order.postal_code,
-                    "city": order.city,
-                    "province": order.province
-                },
-                "paid": order.paid,
-                "transaction": transaction_data,
-                "products": product_entries,
-                "shipping_price": order.shipping_price
-            }
-        }
+        transaction_data = payment_response["transaction"] if order.paid else None
 
-        # Mettre en cache les données de la commande
-        redis_client.set(f"order:{order.id}", json.dumps(response_data))
+        response_data = order_document(
+            order,
+            credit_card={
+                "name": credit_card["name"],
+                "first_digits": first_digits,
+                "last_digits": last_digits,
+                "expiration_year": credit_card["expiration_year"],
+                "expiration_month": credit_card["expiration_month"]
+            },
+            transaction=transaction_data
+        )
+
+        # Mettre en cache les données de la commande (write-through)
+        order_cache.store(order.id, response_data)
 
         if order.paid:
-            return {"success": True}
+            result = {"success": True}
         else:
-            return {"error": "payment-failed", "details": transaction_data}
+            result = {"error": "payment-failed", "details": response_data["order"]["transaction"]}
+
+        # Notifie les clients abonnés (SSE) avec le document final
+        publish_job_event(job_id, "finished", result=result, order=response_data["order"])
+        return result
 
     except Exception as e:
         error_info = {"error": "worker.py-exception", "message": str(e)}
 
         # Persister l'erreur dans la base de données
-        order.transaction_error = json.dumps(error_info)
-        order.save()
+        Order.update(transaction_error=json.dumps(error_info)).where(Order.id == order.id).execute()
+        order_cache.invalidate(order.id)
 
+        publish_job_event(job_id, "finished", result=error_info)
         return error_info
@@ -0,0 +1 @@
+"""Banc d'essai hors ligne de l'API (voir `python -m benchmark --help`)."""
@@ -0,0 +1,324 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmark.stubs import StubServer, fake_products
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+PROVINCES = ["QC", "ON", "AB", "BC", "NS"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmark",
+        description="Mesure chaque route de l'API sans réseau (SQLite/fakeredis et services distants simulés).")
+    parser.add_argument("--products", type=int, default=500, help="taille du catalogue")
+    parser.add_argument("--orders", type=int, default=5000, help="commandes existantes avant les mesures")
+    parser.add_argument("--requests", type=int, default=300, help="requêtes par route")
+    parser.add_argument("--latency", type=float, default=0.0, help="latence (s) ajoutée par le catalogue/la passerelle simulés")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proportion de réponses 500 des services simulés")
+    parser.add_argument("--postgres", action="store_true",
+                        help="utilise PostgreSQL (variables DB_*) au lieu de SQLite; les tables sont recréées, "
+                             "utiliser une base dédiée")
+    parser.add_argument("--redis-url", help="Redis local (ex. redis://localhost/15) au lieu de fakeredis; la base est vidée")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre les résultats comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="hausse relative du p95 tolérée avant de signaler une régression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="hausse absolue du p95 ignorée (bruit de mesure)")
+    parser.add_argument("--check", action="store_true", help="code de sortie 1 en cas de régression")
+    return parser.parse_args(argv)
+
+
+def use_redis(client):
+    """Remplace le client Redis partagé (et ses copies importées) dans les modules de l'API."""
+    from api8inf349 import redis_client as redis_module
+
+    original = redis_module.redis_client
+    for name, module in list(sys.modules.items()):
+        if name.startswith("api8inf349") and getattr(module, "redis_client", None) is original:
+            module.redis_client = client
+
+
+def create_redis(args):
+    if args.redis_url:
+        import redis
+        client = redis.Redis.from_url(args.redis_url)
+        client.flushdb()
+        return client
+    import fakeredis
+    return fakeredis.FakeRedis()
+
+
+def create_db(args):
+    from peewee import SqliteDatabase
+    from api8inf349.database import create_database
+
+    if args.postgres:
+        return create_database()
+    return SqliteDatabase(tempfile.mktemp(suffix=".db"), pragmas={"journal_mode": "wal"})
+
+
+class QueryCounter:
+    """Compte les requêtes SQL exécutées sur la base (remis à zéro avant chaque requête HTTP)."""
+
+    def __init__(self, db):
+        from api8inf349.database import record_sql
+
+        self.count = 0
+        record_sql(db, self._record)
+
+    def _record(self, sql):
+        self.count += 1
+
+
+def seed_orders(count, rng):
+    """Commandes existantes (avec agrégats), dont environ un tiers payées."""
+    from api8inf349.catalog import catalog
+    from api8inf349.database import database
+    from api8inf349.models import Order, OrderProduct
+    from api8inf349.orders import OrderLine, order_aggregates
+
+    products = [product for product in catalog.page(1, len(catalog)) if product.in_stock]
+    for start in range(0, count, 500):
+        orders, lines = [], []
+        for order_id in range(start + 1, min(start + 500, count) + 1):
+            order_lines = [OrderLine(p.id, p.name, p.price, p.weight, rng.randint(1, 3))
+                           for p in rng.sample(products, rng.randint(1, 4))]
+            paid = order_id % 3 == 0
+            orders.append({
+                "total_price": sum(line.price * line.quantity for line in order_lines),
+                "email": f"client{order_id % 200}@example.com" if paid else None,
+                "paid": paid,
+                "transaction_id": f"txn-{order_id}" if paid else None,
+                **order_aggregates(order_lines),
+            })
+            lines.extend({"order": order_id, "product": line.product_id, "quantity": line.quantity}
+                         for line in order_lines)
+        with database.atomic():
+            Order.insert_many(orders).execute()
+            OrderProduct.insert_many(lines).execute()
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def measure(counter, calls):
+    """Exécute les appels un à un et retourne débit, latences et requêtes SQL par appel."""
+    latencies, queries, errors = [], 0, 0
+    start = time.perf_counter()
+    for call in calls:
+        counter.count = 0
+        began = time.perf_counter()
+        response = call()
+        latencies.append(time.perf_counter() - began)
+        queries += counter.count
+        if response.status_code >= 500:
+            errors += 1
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "throughput": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "queries": round(queries / len(latencies), 2),
+        "errors": errors,
+    }
+
+
+def run_scenarios(args, client, counter, redis):
+    from rq import Queue, SimpleWorker
+    from api8inf349.catalog import catalog
+    from api8inf349.config import Config
+
+    rng = random.Random(args.seed)
+    n = args.requests
+    in_stock = [product.id for product in catalog.page(1, len(catalog)) if product.in_stock]
+    pages = max(1, len(catalog) // Config.PRODUCTS_PAGE_SIZE)
+    results = {}
+
+    results["GET /"] = measure(counter, (
+        lambda page=rng.randint(1, pages): client.get(f"/?page={page}")
+        for _ in range(n)))
+
+    created = []
+
+    def create():
+        products = [{"id": product_id, "quantity": rng.randint(1, 3)}
+                    for product_id in rng.sample(in_stock, rng.randint(1, 4))]
+        response = client.post("/order", json={"products": products})
+        created.append(response.get_json()["order_id"])
+        return response
+
+    results["POST /order"] = measure(counter, (create for _ in range(n)))
+
+    def shipping(order_id):
+        return client.put(f"/order/{order_id}", json={"order": {
+            "email": f"bench{order_id}@example.com",
+            "shipping_information": {"country": "Canada", "address": "555 boul. de l'Université",
+                                     "postal_code": "G7H 2B1", "city": "Chicoutimi",
+                                     "province": rng.choice(PROVINCES)}}})
+
+    results["PUT /order/<id> (shipping)"] = measure(counter, (
+        lambda order_id=order_id: shipping(order_id) for order_id in created))
+
+    jobs = []
+
+    def pay(order_id):
+        # ~1 carte sur 10 refusée par la passerelle simulée
+        number = "4242 4242 4242 4242" if rng.random() > 0.1 else "5555 5555 5555 4444"
+        response = client.put(f"/order/{order_id}", json={"credit_card": {
+            "name": "Bench Client", "number": number, "expiration_year": 2030,
+            "expiration_month": 9, "cvv": "123"}})
+        jobs.append(response.get_json()["job_id"])
+        return response
+
+    results["PUT /order/<id> (payment)"] = measure(counter, (
+        lambda order_id=order_id: pay(order_id) for order_id in created))
+
+    # Les paiements sont traités dans ce processus, par un worker en mode burst
+    counter.count = 0
+    began = time.perf_counter()
+    SimpleWorker([Queue(Config.PAYMENTS_QUEUE, connection=redis)], connection=redis).work(burst=True, logging_level="WARNING")
+    elapsed = time.perf_counter() - began
+    results["job process_payment"] = {
+        "requests": len(jobs),
+        "throughput": round(len(jobs) / elapsed, 1),
+        "p50_ms": None, "p95_ms": None, "p99_ms": None,
+        "queries": round(counter.count / len(jobs), 2),
+        "errors": 0,
+    }
+
+    total_orders = args.orders + len(created)
+    results["GET /order/<id>"] = measure(counter, (
+        lambda order_id=rng.randint(1, total_orders): client.get(f"/order/{order_id}")
+        for _ in range(n)))
+
+    # Lecture groupée de 50 commandes (documents en cache ou non)
+    results["GET /orders?ids=(50)"] = measure(counter, (
+        lambda ids=rng.sample(range(1, total_orders + 1), min(50, total_orders)):
+            client.get("/orders?ids=" + ",".join(map(str, ids)))
+        for _ in range(n)))
+
+    results["GET /order"] = measure(counter, (
+        lambda before=rng.choice([None, rng.randint(2, total_orders)]):
+            client.get("/order" if before is None else f"/order?before={before}")
+        for _ in range(n)))
+
+    results["GET /job/<id>"] = measure(counter, (
+        lambda job_id=rng.choice(jobs): client.get(f"/job/{job_id}")
+        for _ in range(n)))
+
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Routes dont le p95 ou le nombre de requêtes SQL dépasse la référence.
+
+    Le nombre de requêtes SQL est déterministe; le p95 ne compte que s'il
+    dépasse la référence à la fois en relatif et en absolu."""
+    regressions = []
+    for route, current in results.items():
+        reference = baseline.get(route)
+        if reference is None:
+            continue
+        if current["queries"] > reference["queries"] + 0.01:
+            regressions.append(f"{route}: {reference['queries']} -> {current['queries']} requêtes SQL")
+        if (current["p95_ms"] and reference["p95_ms"]
+                and current["p95_ms"] > reference["p95_ms"] * (1 + tolerance)
+                and current["p95_ms"] - reference["p95_ms"] > min_delta_ms):
+            regressions.append(f"{route}: p95 {reference['p95_ms']} -> {current['p95_ms']} ms")
+    return regressions
+
+
+def print_report(results, baseline):
+    header = f"{'route':<28} {'req':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL/req':>8} {'5xx':>4}"
+    print(header)
+    print("-" * len(header))
+    for route, r in results.items():
+        cells = [f"{r[key]:>8}" if r[key] is not None else f"{'-':>8}" for key in ("p50_ms", "p95_ms", "p99_ms")]
+        line = f"{route:<28} {r['requests']:>5} {r['throughput']:>8} {' '.join(cells)} {r['queries']:>8} {r['errors']:>4}"
+        reference = baseline.get(route)
+        if reference and reference.get("p95_ms") and r["p95_ms"]:
+            line += f"   (p95 réf. {reference['p95_ms']})"
+        print(line)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    stub = StubServer(fake_products(args.products, args.seed), latency=args.latency,
+                      error_rate=args.error_rate, seed=args.seed).start()
+
+    from api8inf349 import app
+    from api8inf349.bootstrap import sync_products
+    from api8inf349.catalog import catalog
+    from api8inf349.config import Config
+    from api8inf349.database import database
+    from api8inf349.models import Product, Order, OrderProduct
+
+    Config.PRODUCTS_URL = f"{stub.url}/products/"
+    Config.PAYMENT_URL = f"{stub.url}/pay/"
+
+    redis = create_redis(args)
+    use_redis(redis)
+
+    db = create_db(args)
+    database.initialize(db)
+    with database:
+        database.drop_tables([OrderProduct, Order, Product])
+        database.create_tables([Product, Order, OrderProduct])
+        report = sync_products(conditional=False)
+        if report["status"] != "synced":
+            sys.exit(f"Catalogue simulé indisponible: {report}")
+        catalog.clear()
+        seed_orders(args.orders, random.Random(args.seed))
+
+    counter = QueryCounter(db)
+    app.config["TESTING"] = True
+    try:
+        results = run_scenarios(args, app.test_client(), counter, redis)
+    finally:
+        stub.stop()
+
+    saved = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    settings = {"products": args.products, "orders": args.orders, "requests": args.requests,
+                "latency": args.latency, "error_rate": args.error_rate,
+                "database": "postgres" if args.postgres else "sqlite",
+                "redis": "redis" if args.redis_url else "fakeredis"}
+    baseline = saved.get("results", {}) if saved.get("settings") == settings else {}
+    if saved and not baseline:
+        print("Référence ignorée: paramètres différents de ceux de la mesure.\n")
+
+    print_report(results, baseline)
+    print(f"\nAppels aux services simulés: {stub.calls}")
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print("\nRégressions:")
+        for regression in regressions:
+            print(f"  - {regression}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({
+            "settings": settings,
+            "python": platform.python_version(),
+            "results": results,
+        }, indent=2) + "\n")
+        print(f"\nRéférence enregistrée dans {args.baseline}")
+
+    if args.check and regressions:
+        sys.exit(1)
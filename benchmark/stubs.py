@@ -0,0 +1,114 @@
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_products(count, seed=0):
+    """Catalogue synthétique de `count` produits (~1 sur 7 hors stock)."""
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "name": f"Product {i}",
+            "description": f"Synthetic product {i} " + "lorem ipsum " * rng.randint(1, 8),
+            "image": f"{i % 30}.jpg",
+            "weight": rng.randint(20, 1500),
+            "price": round(rng.uniform(1, 80), 2),
+            "in_stock": i % 7 != 0,
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+class StubServer:
+    """Serveur HTTP local qui imite le catalogue distant et la passerelle de paiement.
+
+    - `GET /products/`: le catalogue, avec ETag (304 si inchangé);
+    - `POST /pay/`: 200 avec une transaction, ou 422 pour une carte qui ne
+      commence pas par 4;
+    - `latency` (secondes) est ajoutée à chaque réponse et `error_rate`
+      est la proportion de réponses 500.
+    """
+
+    def __init__(self, products, latency=0.0, error_rate=0.0, seed=0):
+        self.products = products
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = {"products": 0, "pay": 0, "errors": 0}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/products/":
+                    return self._send(404, {"error": "not-found"})
+                stub.calls["products"] += 1
+                body = json.dumps({"products": stub.products}).encode()
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                if self._fail():
+                    return
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, None, {"ETag": etag})
+                self._send(200, body, {"ETag": etag})
+
+            def do_POST(self):
+                if self.path != "/pay/":
+                    return self._send(404, {"error": "not-found"})
+                stub.calls["pay"] += 1
+                data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self._fail():
+                    return
+                number = str(data.get("credit_card", {}).get("number", ""))
+                if not number.startswith("4"):
+                    return self._send(422, {"errors": {"credit_card": {
+                        "code": "card-declined", "name": "La carte de crédit a été déclinée."}}})
+                self._send(200, {"transaction": {
+                    "id": uuid.uuid4().hex, "success": True, "amount_charged": data.get("amount_charged")}})
+
+            def _fail(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub.error_rate and stub.random.random() < stub.error_rate:
+                    stub.calls["errors"] += 1
+                    self._send(500, {"error": "stub-failure"})
+                    return True
+                return False
+
+            def _send(self, status, body, headers=None):
+                if body is not None and not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if body is not None:
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body is not None:
+                    self.wfile.write(body)
+
+        return Handler
@@ -1,6 +1,9 @@
 const orderId = new URLSearchParams(window.location.search).get("order_id");
 console.log("orderId =", orderId);
 
+// Contenu du dernier paiement envoyé (clé d'idempotence à oublier s'il échoue)
+let paymentBody = null;
+
 function reloadOrderInfo() {
     fetch(`http://localhost:5000/order/${orderId}`)
         .then(res => res.json())
@@ -45,7 +48,7 @@ function renderProductDetails(products) {
         const imageId = p.id - 1;
 
         line.innerHTML = `
-            <img src="/img/${imageId}.jpg" alt="${p.name}" />
+            <img src="${imageUrl(`${imageId}.jpg`, 120)}" alt="${p.name}" />
             <div class="product-info-small">
                 <p><strong>${p.name}</strong></p>
                 <p>Prix unitaire : $${p.price.toFixed(2)}</p>
@@ -57,6 +60,71 @@ function renderProductDetails(products) {
     });
 }
 
+function showPaymentResult(order) {
+    if (order.paid) {
+        document.getElementById("payment-form").innerHTML = `
+        <p style="color: green;"><strong>Paiement effectué avec succès !</strong></p>`;
+    } else {
+        renderPaymentForm("Le paiement a échoué. Vérifiez les informations de carte.");
+    }
+    reloadOrderInfo();
+}
+
+// Statut poussé par le serveur (SSE), avec repli sur le polling
+function waitForPayment(jobId) {
+    if (!window.EventSource) {
+        pollPayment(jobId);
+        return;
+    }
+
+    const source = new EventSource(`http://localhost:5000/job/${jobId}/events`);
+    let done = false;
+
+    source.addEventListener("finished", event => {
+        done = true;
+        source.close();
+        const job = JSON.parse(event.data);
+        if (job.order) {
+            showPaymentResult(job.order);
+        } else {
+            fetch(`http://localhost:5000/order/${orderId}`)
+                .then(res => res.json())
+                .then(orderRes => showPaymentResult(orderRes.order));
+        }
+    });
+    source.addEventListener("failed", () => {
+        done = true;
+        source.close();
+        renderPaymentForm("Échec du paiement. Veuillez réessayer.");
+    });
+    const fallback = () => {
+        source.close();
+        if (!done) {
+            pollPayment(jobId);
+        }
+    };
+    source.addEventListener("timeout", fallback);
+    source.onerror = fallback;
+}
+
+function pollPayment(jobId) {
+    const interval = setInterval(() => {
+        fetch(`http://localhost:5000/job/${jobId}`)
+            .then(res => res.json())
+            .then(job => {
+                if (job.status === "finished") {
+                    clearInterval(interval);
+                    fetch(`http://localhost:5000/order/${orderId}`)
+                        .then(res => res.json())
+                        .then(orderRes => showPaymentResult(orderRes.order));
+                } else if (job.status === "failed") {
+                    clearInterval(interval);
+                    renderPaymentForm("Échec du paiement. Veuillez réessayer.");
+                }
+            });
+    }, 2000);
+}
+
 function setupPaymentHandler() {
     document.getElementById("confirm-payment").onclick = () => {
         const card = {
@@ -72,44 +140,25 @@ function setupPaymentHandler() {
             return;
         }
 
+        const body = JSON.stringify({credit_card: card});
+        paymentBody = body;
         fetch(`http://localhost:5000/order/${orderId}`, {
             method: "PUT",
-            headers: {"Content-Type": "application/json"},
-            body: JSON.stringify({credit_card: card})
+            headers: {"Content-Type": "application/json", "Idempotency-Key": idempotencyKey(body)},
+            body
         })
             .then(res => res.json())
             .then(data => {
                 const jobId = data.job_id;
                 if (!jobId) {
+                    forgetIdempotencyKey(body);
                     alert("Erreur : ID du job introuvable.");
                     return;
                 }
 
                 document.getElementById("payment-form").innerHTML = `<p>Paiement en cours... (Job ID: ${jobId})</p>`;
 
-                const interval = setInterval(() => {
-                    fetch(`http://localhost:5000/job/${jobId}`)
-                        .then(res => res.json())
-                        .then(job => {
-                            if (job.status === "finished") {
-                                clearInterval(interval);
-                                fetch(`http://localhost:5000/order/${orderId}`)
-                                    .then(res => res.json())
-                                    .then(orderRes => {
-                                        if (orderRes.order.paid) {
-                                            document.getElementById("payment-form").innerHTML = `
-                                            <p style="color: green;"><strong>Paiement effectué avec succès !</strong></p>`;
-                                        } else {
-                                            renderPaymentForm("Le paiement a échoué. Vérifiez les informations de carte.");
-                                        }
-                                        reloadOrderInfo();
-                                    });
-                            } else if (job.status === "failed") {
-                                clearInterval(interval);
-                                renderPaymentForm("Échec du paiement. Veuillez réessayer.");
-                            }
-                        });
-                }, 2000);
+                waitForPayment(jobId);
             })
             .catch(err => alert("Erreur lors du paiement : " + err));
     };
@@ -143,6 +192,11 @@ function setupNavToggle() {
 
 
 function renderPaymentForm(errorMsg = "") {
+    if (errorMsg && paymentBody) {
+        // Paiement refusé ou en échec: un nouvel essai avec la même carte est un nouveau paiement
+        forgetIdempotencyKey(paymentBody);
+        paymentBody = null;
+    }
     document.getElementById("payment-form").innerHTML = `
         <h3>Informations de carte bancaire</h3>
         ${errorMsg ? `<p style="color:red;"><strong>${errorMsg}</strong></p>` : ""}
@@ -0,0 +1,16 @@
+// Même clé d'idempotence tant que le contenu envoyé ne change pas: un double clic
+// ou un nouvel envoi après une erreur réseau ne refait pas le travail côté serveur
+const idempotencyKeys = {};
+
+function idempotencyKey(body) {
+    if (!idempotencyKeys[body]) {
+        idempotencyKeys[body] = crypto.randomUUID();
+    }
+    return idempotencyKeys[body];
+}
+
+// Après un échec définitif (paiement refusé, job en échec, réponse d'erreur),
+// le prochain envoi du même contenu est une nouvelle tentative: nouvelle clé
+function forgetIdempotencyKey(body) {
+    delete idempotencyKeys[body];
+}
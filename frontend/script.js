@@ -2,8 +2,33 @@ let currentPage = 1;
 const limit = 12;
 const cart = {};
 
+function productsUrl(page) {
+    // Recherche (index du catalogue côté API) seulement si un mot ou un filtre est saisi
+    const query = document.getElementById("search-input").value.trim();
+    const inStockOnly = document.getElementById("in-stock-only").checked;
+    if (!query && !inStockOnly) {
+        return `http://localhost:5000/?page=${page}&limit=${limit}`;
+    }
+    const params = new URLSearchParams({q: query, page: page, limit: limit});
+    if (inStockOnly) {
+        params.set("in_stock", "true");
+    }
+    return `http://localhost:5000/products/search?${params}`;
+}
+
+let searchTimer = null;
+
+function onSearchInput() {
+    // Une requête après 200 ms sans frappe
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        currentPage = 1;
+        fetchProducts(1);
+    }, 200);
+}
+
 function fetchProducts(page = 1) {
-    fetch(`http://localhost:5000/?page=${page}&limit=${limit}`)
+    fetch(productsUrl(page))
         .then(response => response.json())
         .then(data => {
             displayProducts(data.products);
@@ -62,7 +87,7 @@ function displayProducts(products) {
 
         const img = document.createElement("img");
         const imageId = product.id - 1;  // car 0.jpeg correspond à l'ID 1
-        img.src = `/img/${imageId}.jpg`;
+        img.src = imageUrl(`${imageId}.jpg`, 200);  // miniature versionnée (mise en cache)
         img.alt = product.name;
         if (!product.in_stock) {
 
@@ -153,7 +178,7 @@ function renderCart() {
         div.className = "cart-item";
 
         div.innerHTML = `
-      <img src="/frontend/static/img/${item.id - 1}.jpg" alt="${item.name}">
+      <img src="${imageUrl(`${item.id - 1}.jpg`, 120)}" alt="${item.name}">
       <div class="cart-item-info">
         <p><strong>${item.name}</strong></p>
         <p>Prix unitaire : $${item.price.toFixed(2)}</p>
@@ -167,6 +192,45 @@ function renderCart() {
 
         cartItems.appendChild(div);
     });
+
+    fetchQuote();
+}
+
+// Sous-total, taxes et livraison calculés par le serveur (POST /quote), sans créer de commande
+function fetchQuote() {
+    const summary = document.getElementById("cart-summary");
+    const products = Object.values(cart).map(item => ({
+        id: item.id,
+        quantity: item.quantity
+    }));
+
+    if (products.length === 0) {
+        summary.innerHTML = "";
+        return;
+    }
+
+    fetch("http://localhost:5000/quote", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json"
+        },
+        body: JSON.stringify({products, province: "QC"})
+    })
+        .then(response => response.ok ? response.json() : null)
+        .then(data => {
+            if (!data) {
+                summary.innerHTML = "";
+                return;
+            }
+            const quote = data.quote;
+            summary.innerHTML = `
+      <p>Sous-total : $${quote.subtotal.toFixed(2)}</p>
+      <p>Taxes (QC) : $${quote.tax.toFixed(2)}</p>
+      <p>Livraison : $${quote.shipping_price.toFixed(2)}</p>
+      <p><strong>Total estimé : $${quote.total.toFixed(2)}</strong></p>
+    `;
+        })
+        .catch(error => console.error(error));
 }
 
 
@@ -198,15 +262,18 @@ function submitOrder() {
         return;
     }
 
+    const body = JSON.stringify({products});
     fetch("http://localhost:5000/order", {
         method: "POST",
         headers: {
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            "Idempotency-Key": idempotencyKey(body)
         },
-        body: JSON.stringify({products})  // <-- CORRECTED HERE
+        body
     })
         .then(response => {
             if (!response.ok) {
+                forgetIdempotencyKey(body);  // réponse d'erreur enregistrée: un nouvel envoi est un nouvel essai
                 throw new Error("Erreur lors de la commande");
             }
             return response.json();
@@ -1,5 +1,43 @@
 const jobId = new URLSearchParams(window.location.search).get("job_id");
 
+function displayStatus(data) {
+  const status = data.status;
+  const result = data.result;
+  const display = document.getElementById("status");
+
+  if (status === "finished") {
+    display.innerHTML = `<strong>Paiement terminé avec succès !</strong><br/>Transaction : ${JSON.stringify(result)}`;
+  } else if (status === "failed") {
+    display.innerHTML = `<strong>Le paiement a échoué.</strong>`;
+  } else {
+    display.textContent = `Statut actuel : ${status}`;
+  }
+}
+
+// Mises à jour poussées par le serveur (SSE); le bouton garde le polling
+function followStatus() {
+  if (!jobId || !window.EventSource) {
+    checkStatus();
+    return;
+  }
+
+  const source = new EventSource(`http://localhost:5000/job/${jobId}/events`);
+  ["queued", "started", "deferred", "scheduled"].forEach((status) =>
+    source.addEventListener(status, (event) => displayStatus(JSON.parse(event.data)))
+  );
+  ["finished", "failed"].forEach((status) =>
+    source.addEventListener(status, (event) => {
+      source.close();
+      displayStatus(JSON.parse(event.data));
+    })
+  );
+  source.addEventListener("timeout", () => source.close());
+  source.onerror = () => {
+    source.close();
+    checkStatus();
+  };
+}
+
 function checkStatus() {
   if (!jobId) {
     document.getElementById("status").textContent = "Aucun ID de job fourni.";
@@ -8,19 +46,7 @@ function checkStatus() {
 
   fetch(`http://localhost:5000/job/${jobId}`)
     .then((res) => res.json())
-    .then((data) => {
-      const status = data.status;
-      const result = data.result;
-      const display = document.getElementById("status");
-
-      if (status === "finished") {
-        display.innerHTML = `<strong>Paiement terminé avec succès !</strong><br/>Transaction : ${JSON.stringify(result)}`;
-      } else if (status === "failed") {
-        display.innerHTML = `<strong>Le paiement a échoué.</strong>`;
-      } else {
-        display.textContent = `Statut actuel : ${status}`;
-      }
-    })
+    .then(displayStatus)
     .catch((err) => {
       document.getElementById("status").textContent = "Erreur lors de la récupération du statut.";
       console.error(err);
@@ -29,4 +55,4 @@ function checkStatus() {
 
 document.getElementById("refresh-btn").onclick = checkStatus;
 
-document.addEventListener("DOMContentLoaded", checkStatus);
+document.addEventListener("DOMContentLoaded", followStatus);
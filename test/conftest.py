@@ -1,21 +1,28 @@
 import os
 import sys
 import pytest
+import fakeredis
 from peewee import SqliteDatabase
 import tempfile
 import json
-from app import app as flask_app
-from app.models import Product, Order, BaseModel
-import requests
 
 # Ajout du répertoire parent au chemin d'importation
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from api8inf349 import app as flask_app
+from api8inf349 import redis_client as redis_module
+from api8inf349.catalog import catalog
+from api8inf349.config import Config
+from api8inf349.database import database, record_sql
+from api8inf349.gateway import gateway
+from api8inf349.models import Product, Order, OrderProduct
+
 class MockResponse:
     def __init__(self, json_data, status_code):
         self.json_data = json_data
         self.status_code = status_code
         self.text = json.dumps(json_data)
+        self.headers = {}
 
     def json(self):
         return self.json_data
@@ -87,74 +94,94 @@ def client(app):
     """Fixture pour créer un client de test"""
     return app.test_client()
 
+def use_fake_redis(monkeypatch):
+    """Remplace le client Redis partagé (et ses copies importées) par fakeredis."""
+    original = redis_module.redis_client
+    fake = fakeredis.FakeRedis()
+    for name, module in list(sys.modules.items()):
+        if name.startswith("api8inf349") and getattr(module, "redis_client", None) is original:
+            monkeypatch.setattr(module, "redis_client", fake)
+    return fake
+
+
 @pytest.fixture
-def test_db():
-    """Fixture pour créer une base de données temporaire en mémoire pour les tests"""
-    # Créer un fichier temporaire pour la BD
+def redis_client(monkeypatch):
+    """Fixture pour remplacer Redis par fakeredis"""
+    return use_fake_redis(monkeypatch)
+
+
+@pytest.fixture
+def test_db(redis_client):
+    """Fixture pour créer une base de données temporaire pour les tests"""
+    # Un fichier plutôt que :memory: pour que les threads partagent la même BD
     db_fd, db_path = tempfile.mkstemp()
     test_database = SqliteDatabase(db_path)
-    
+
     # Remplacer la BD originale par notre BD de test
-    original_db = BaseModel._meta.database
-    BaseModel._meta.database = test_database
-    
+    original_db = database.obj
+    database.initialize(test_database)
+
     # Créer les tables dans la BD de test
     test_database.connect()
-    test_database.create_tables([Product, Order])
-
-    Product.delete().execute()
-    Order.delete().execute()
+    test_database.create_tables([Product, Order, OrderProduct])
 
     # Peupler la BD avec des données de test
     for product_data in MOCK_PRODUCTS["products"]:
-        Product.get_or_create(**product_data)
-    
+        Product.create(**product_data)
+    catalog.clear()
+
     yield test_database
-    
+
     # Nettoyer après les tests
     test_database.close()
     os.close(db_fd)
     os.unlink(db_path)
     # Restaurer la BD originale
-    BaseModel._meta.database = original_db
+    database.initialize(original_db)
+    catalog.clear()
+
+@pytest.fixture
+def executed_sql(test_db):
+    """Liste du SQL exécuté sur la BD de test (à vider avant la partie mesurée)"""
+    executed = []
+    record_sql(test_db, executed.append)
+    yield executed
+    del test_db.execute_sql
 
 @pytest.fixture
 def mock_requests_get(monkeypatch):
-    """Fixture pour simuler requests.get"""
+    """Fixture pour simuler les GET du client HTTP de la passerelle"""
     def mock_get(*args, **kwargs):
-        if args[0] == "http://dimensweb.uqac.ca/~jgnault/shops/products/":
+        if args[0] == Config.PRODUCTS_URL:
             return MockResponse(MOCK_PRODUCTS, 200)
         return MockResponse({"error": "URL not found"}, 404)
-    
-    monkeypatch.setattr(requests, "get", mock_get)
+
+    monkeypatch.setattr(gateway, "get", mock_get)
 
 @pytest.fixture
 def mock_requests_post(monkeypatch):
-    """Fixture pour simuler requests.post"""
+    """Fixture pour simuler les POST du client HTTP de la passerelle"""
     def mock_post(*args, **kwargs):
-        if args[0] == "https://dimensweb.uqac.ca/~jgnault/shops/pay/":
+        if args[0] == Config.PAYMENT_URL:
             data = kwargs.get('json', {})
             card_number = data.get('credit_card', {}).get('number', '')
-            
+
             # Cas de test: Carte commençant par 4 -> succès, tous les autres -> échec
             if card_number.startswith('4'):
                 return MockResponse(MOCK_PAYMENT_SUCCESS, 200)
             else:
                 return MockResponse(MOCK_PAYMENT_FAILURE, 422)
-        
+
         return MockResponse({"error": "URL not found"}, 404)
-    
-    monkeypatch.setattr(requests, "post", mock_post)
+
+    monkeypatch.setattr(gateway, "post", mock_post)
 
 @pytest.fixture
 def create_test_order(test_db):
     """Fixture pour créer une commande de test"""
     product = Product.get(Product.id == 1)
-    order = Order.create(
-        product=product,
-        quantity=2,
-        total_price=product.price * 2
-    )
+    order = Order.create(total_price=product.price * 2)
+    OrderProduct.create(order=order, product=product, quantity=2)
     return order
 
 @pytest.fixture
@@ -163,8 +190,6 @@ def create_complete_order(test_db):
     product = Product.get(Product.id == 1)
     
     order = Order.create(
-        product=product,
-        quantity=2,
         total_price=product.price * 2,
         total_price_tax=product.price * 2 * 1.15,
         email="test@example.com",
@@ -175,4 +200,5 @@ def create_complete_order(test_db):
         province="QC",
         shipping_price=5.0
     )
+    OrderProduct.create(order=order, product=product, quantity=2)
     return order
\ No newline at end of file
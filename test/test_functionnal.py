@@ -1,6 +1,6 @@
 import pytest
 import json
-from app.models import Product, Order
+from api8inf349.models import Product, Order
 
 class TestAPIRoutes:
     """Tests fonctionnels des routes API"""
@@ -21,6 +21,23 @@ class TestAPIRoutes:
         assert first_product["name"] == "Brown eggs"
         assert first_product["price"] == 28.1
         assert first_product["in_stock"] == True
+
+    def test_get_products_cursor(self, client, test_db):
+        """Test de la pagination par curseur (?after=) du catalogue"""
+        response = client.get('/?after=1&limit=1')
+
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert [p["id"] for p in data["products"]] == [2]
+        assert data["next_after"] == 2
+        assert data["total"] == 3
+
+        # La limite est plafonnée côté serveur
+        response = client.get('/?after=0&limit=100000')
+        data = json.loads(response.data)
+        assert len(data["products"]) == 3
+        assert data["next_after"] is None
     
     def test_create_order_success(self, client, test_db):
         """Test de création d'une commande avec succès"""
@@ -104,6 +121,55 @@ class TestAPIRoutes:
         data = json.loads(response.data)
         assert data["errors"]["product"]["code"] == "out-of-inventory"
     
+    def test_create_order_multiple_products(self, client, test_db):
+        """Test de création d'une commande à plusieurs lignes (ids en double fusionnés)"""
+        order_data = {"products": [{"id": 1, "quantity": 2}, {"id": 2}, {"id": 1, "quantity": 1}]}
+
+        response = client.post('/order',
+                               data=json.dumps(order_data),
+                               content_type='application/json')
+
+        assert response.status_code == 201
+        order = Order.get(Order.id == json.loads(response.data)["order_id"])
+        lines = {op.product_id: op.quantity for op in order.products}
+        assert lines == {1: 3, 2: 1}
+        assert order.total_price == pytest.approx(28.1 * 3 + 29.45)
+
+    def test_create_order_rejected_without_write(self, client, test_db):
+        """Un panier refusé ne laisse aucune commande orpheline"""
+        order_data = {"products": [{"id": 1, "quantity": 1}, {"id": 3, "quantity": 1}]}
+
+        response = client.post('/order',
+                               data=json.dumps(order_data),
+                               content_type='application/json')
+
+        assert response.status_code == 422
+        assert Order.select().count() == 0
+
+    def test_quote_without_write(self, client, test_db):
+        """Le devis calcule taxes et livraison sans créer de commande"""
+        quote_data = {"products": [{"id": 1, "quantity": 2}, {"id": 2}], "province": "QC"}
+
+        response = client.post('/quote',
+                               data=json.dumps(quote_data),
+                               content_type='application/json')
+
+        assert response.status_code == 200
+        quote = json.loads(response.data)["quote"]
+        assert quote["subtotal"] == pytest.approx(28.1 * 2 + 29.45)
+        assert quote["tax"] == pytest.approx(quote["subtotal"] * 0.15)
+        assert quote["total_weight"] == 400 * 2 + 299
+        assert quote["shipping_price"] == 10
+        assert quote["total"] == pytest.approx(quote["subtotal"] + quote["tax"] + 10)
+        assert Order.select().count() == 0
+
+        for province in ("XX", ["QC"], {"code": "QC"}):
+            response = client.post('/quote',
+                                   data=json.dumps({"product": {"id": 1}, "province": province}),
+                                   content_type='application/json')
+            assert response.status_code == 422
+            assert json.loads(response.data)["errors"]["province"]["code"] == "invalid-value"
+
     def test_get_order(self, client, test_db, create_test_order):
         """Test de récupération des détails d'une commande"""
         order = create_test_order
@@ -119,6 +185,100 @@ class TestAPIRoutes:
         assert data["order"]["product"]["id"] == order.product.id
         assert data["order"]["product"]["quantity"] == order.quantity
     
+    def test_get_order_cache_updated_on_write(self, client, test_db):
+        """Le document en cache suit les mises à jour de la commande"""
+        response = client.post('/order',
+                               data=json.dumps({"product": {"id": 1, "quantity": 1}}),
+                               content_type='application/json')
+        order_id = json.loads(response.data)["order_id"]
+
+        data = json.loads(client.get(f'/order/{order_id}').data)
+        assert data["order"]["email"] is None
+
+        shipping_data = {"order": {"email": "cache@example.com", "shipping_information": {
+            "country": "Canada", "address": "1 rue", "postal_code": "G7H 1A1",
+            "city": "Chicoutimi", "province": "QC"}}}
+        client.put(f'/order/{order_id}', data=json.dumps(shipping_data), content_type='application/json')
+
+        data = json.loads(client.get(f'/order/{order_id}').data)
+        assert data["order"]["email"] == "cache@example.com"
+        assert data["order"]["shipping_price"] == 5
+
+    def test_get_orders_batch(self, client, test_db, redis_client, monkeypatch):
+        """Lecture groupée: une requête SQL pour les absences du cache, puis aucune"""
+        from api8inf349.config import Config
+
+        monkeypatch.setattr(Config, "SQL_PROFILE_HEADER", True)
+        order_ids = [json.loads(client.post('/order', data=json.dumps({"product": {"id": pid, "quantity": 1}}),
+                                            content_type='application/json').data)["order_id"]
+                     for pid in (1, 2)]
+        redis_client.delete(*(f"order:{order_id}" for order_id in order_ids))
+
+        response = client.get(f'/orders?ids={order_ids[1]},999,{order_ids[0]}')
+        assert response.status_code == 200
+        assert response.headers["X-DB"].startswith("queries=1;")
+        orders = json.loads(response.data)["orders"]
+        assert orders[0] == json.loads(client.get(f'/order/{order_ids[1]}').data)
+        assert orders[1] == {"id": 999, "errors": {"order": {"code": "not-found", "name": "Order not found"}}}
+        assert orders[2]["order"]["id"] == order_ids[0]
+
+        # Documents remis en cache par la première lecture
+        response = client.post('/orders', data=json.dumps({"ids": order_ids}), content_type='application/json')
+        assert response.headers["X-DB"].startswith("queries=0;")
+        assert [o["order"]["id"] for o in json.loads(response.data)["orders"]] == order_ids
+
+        assert client.get('/orders?ids=1,abc').status_code == 422
+        for body in ({"ids": "12"}, {"ids": [True]}, {"ids": [1.5]}, {"ids": ["1"]}):
+            response = client.post('/orders', data=json.dumps(body), content_type='application/json')
+            assert response.status_code == 422
+            assert json.loads(response.data)["errors"]["ids"]["code"] == "invalid-value"
+
+    def test_import_orders_bulk(self, client, test_db, monkeypatch):
+        """Import NDJSON: un résultat par panier, dans l'ordre, insertions par lot"""
+        from api8inf349.config import Config
+
+        monkeypatch.setattr(Config, "ORDERS_BULK_CHUNK", 2)
+        monkeypatch.setattr(Config, "ORDERS_BULK_MAX_LINE", 200)
+        body = b"\n".join([
+            json.dumps({"product": {"id": 1, "quantity": 2}}).encode(),
+            b"{not json",
+            json.dumps({"products": [{"id": 1, "quantity": 1}, {"id": 2, "quantity": 3}]}).encode(),
+            b"",
+            json.dumps({"product": {"id": 3, "quantity": 1}}).encode(),
+            json.dumps({"products": [{"id": 2, "quantity": 1}] * 20}).encode(),
+            json.dumps({"products": []}).encode(),
+        ]) + b"\n"
+
+        response = client.post('/orders/bulk', data=body, content_type='application/x-ndjson')
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        results = [json.loads(line) for line in response.data.splitlines()]
+
+        assert [result["line"] for result in results] == [1, 2, 3, 5, 6, 7]
+        assert results[1]["errors"]["cart"]["code"] == "invalid-json"
+        assert results[3]["errors"]["products"]["code"] == "not-found"
+        assert results[4]["errors"]["cart"]["code"] == "too-large"
+        assert results[5]["errors"]["products"]["code"] == "empty"
+
+        order = json.loads(client.get(f'/order/{results[2]["order_id"]}').data)["order"]
+        assert [(p["id"], p["quantity"]) for p in order["products"]] == [(1, 1), (2, 3)]
+        assert order["total_price"] == pytest.approx(28.1 + 29.45 * 3)
+        assert json.loads(client.get(f'/order/{results[0]["order_id"]}').data)["order"]["products"][0]["quantity"] == 2
+
+    def test_n_plus_one_checked_in_streams(self, client, test_db, monkeypatch):
+        """Les requêtes d'une réponse en flux passent aussi par la détection N+1"""
+        from api8inf349.config import Config
+        from api8inf349.profiler import NPlusOneError
+
+        monkeypatch.setattr(Config, "ORDERS_BULK_CHUNK", 1)
+        monkeypatch.setattr(Config, "N_PLUS_ONE_THRESHOLD", 3)
+        body = b"".join(json.dumps({"product": {"id": 1, "quantity": 1}}).encode() + b"\n" for _ in range(5))
+
+        response = client.post('/orders/bulk', data=body, content_type='application/x-ndjson')
+        assert len(response.data.splitlines()) == 5  # une transaction par panier, après `after_request`
+        with pytest.raises(NPlusOneError):
+            response.close()
+
     def test_get_order_not_found(self, client, test_db):
         """Test de récupération d'une commande inexistante"""
         response = client.get('/order/9999')
@@ -254,6 +414,354 @@ class TestAPIRoutes:
         data = json.loads(response.data)
         assert data["order"]["paid"] == True
 
+    def test_list_orders_paginated(self, client, test_db):
+        """Test de la liste des commandes: curseur, filtre et export NDJSON"""
+        for product_ids in ([1], [1, 2], [2]):
+            client.post('/order',
+                        data=json.dumps({"products": [{"id": pid} for pid in product_ids]}),
+                        content_type='application/json')
+        Order.update(paid=True).where(Order.id == 2).execute()
+
+        response = client.get('/order?limit=2')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [o["id"] for o in data["orders"]] == [3, 2]
+        assert [o["products_count"] for o in data["orders"]] == [1, 2]
+        assert data["next_before"] == 2
+
+        data = json.loads(client.get('/order?before=2').data)
+        assert [o["id"] for o in data["orders"]] == [1]
+        assert data["next_before"] is None
+
+        data = json.loads(client.get('/order?paid=true').data)
+        assert [o["id"] for o in data["orders"]] == [2]
+
+        response = client.get('/order?format=ndjson')
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert [o["id"] for o in lines] == [3, 2, 1]
+
+    def test_idempotent_order_and_payment(self, client, test_db):
+        """Idempotency-Key rejoue la réponse; un paiement en cours n'est pas relancé"""
+        order_data = json.dumps({"product": {"id": 1, "quantity": 1}})
+        headers = {"Idempotency-Key": "cart-1"}
+
+        first = client.post('/order', data=order_data, content_type='application/json', headers=headers)
+        second = client.post('/order', data=order_data, content_type='application/json', headers=headers)
+        assert second.status_code == 201
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert json.loads(second.data) == json.loads(first.data)
+        assert Order.select().count() == 1
+
+        response = client.post('/order', data=json.dumps({"product": {"id": 2}}),
+                               content_type='application/json', headers=headers)
+        assert response.status_code == 422
+        assert json.loads(response.data)["errors"]["idempotency_key"]["code"] == "key-reused"
+
+        order_id = json.loads(first.data)["order_id"]
+        shipping_data = {"order": {"email": "pay@example.com", "shipping_information": {
+            "country": "Canada", "address": "1 rue", "postal_code": "G7H 1A1",
+            "city": "Chicoutimi", "province": "QC"}}}
+        client.put(f'/order/{order_id}', data=json.dumps(shipping_data), content_type='application/json')
+
+        payment_data = {"credit_card": {"name": "John Doe", "number": "4242 4242 4242 4242",
+                                        "expiration_year": 2030, "expiration_month": 9, "cvv": "123"}}
+        first = client.put(f'/order/{order_id}', data=json.dumps(payment_data), content_type='application/json')
+        payment_data["credit_card"]["cvv"] = "321"
+        second = client.put(f'/order/{order_id}', data=json.dumps(payment_data), content_type='application/json')
+        assert first.status_code == second.status_code == 202
+        assert json.loads(second.data)["job_id"] == json.loads(first.data)["job_id"]
+
+    def test_payment_claimed_before_enqueue(self, client, test_db, create_complete_order, monkeypatch):
+        """Un second PUT entre la réservation et la mise en file reçoit le même job (un seul job en file)"""
+        from rq import Queue
+        from api8inf349 import routes
+
+        order_id = create_complete_order.id
+        payment_data = json.dumps({"credit_card": {"name": "John Doe", "number": "4242 4242 4242 4242",
+                                                   "expiration_year": 2030, "expiration_month": 9, "cvv": "123"}})
+        enqueue_job = Queue.enqueue_job
+        concurrent = []
+
+        def enqueue_after_concurrent_put(queue, job, *args, **kwargs):
+            if not concurrent:
+                concurrent.append(client.put(f'/order/{order_id}', data=payment_data,
+                                             content_type='application/json'))
+            return enqueue_job(queue, job, *args, **kwargs)
+
+        monkeypatch.setattr(Queue, "enqueue_job", enqueue_after_concurrent_put)
+        first = client.put(f'/order/{order_id}', data=payment_data, content_type='application/json')
+
+        assert first.status_code == concurrent[0].status_code == 202
+        assert json.loads(concurrent[0].data)["job_id"] == json.loads(first.data)["job_id"]
+        assert Queue("payments", connection=routes.redis_client).job_ids == [json.loads(first.data)["job_id"]]
+
+    def test_shipping_update_during_payment(self, client, test_db, create_complete_order):
+        """La mise à jour de l'expédition est refusée (409) pendant un paiement"""
+        from api8inf349.idempotency import claim_payment, release_payment
+
+        order_id = create_complete_order.id
+        shipping_data = json.dumps({"order": {"email": "new@example.com", "shipping_information": {
+            "country": "Canada", "address": "2 rue", "postal_code": "H2X 1A1",
+            "city": "Montréal", "province": "AB"}}})
+
+        claim_payment(order_id, "job-a")
+        response = client.put(f'/order/{order_id}', data=shipping_data, content_type='application/json')
+        assert response.status_code == 409
+        assert json.loads(response.data)["errors"]["order"]["code"] == "payment-in-progress"
+        assert Order.get_by_id(order_id).province == "QC"
+
+        release_payment(order_id, "job-a")
+        response = client.put(f'/order/{order_id}', data=shipping_data, content_type='application/json')
+        assert response.status_code == 200
+
+    def test_payment_during_shipping_update(self, client, test_db, create_complete_order, monkeypatch):
+        """Un paiement reçu pendant l'écriture de l'expédition est refusé (409), sans job en file"""
+        from rq import Queue
+        from api8inf349 import routes
+
+        order_id = create_complete_order.id
+        shipping_data = json.dumps({"order": {"email": "new@example.com", "shipping_information": {
+            "country": "Canada", "address": "2 rue", "postal_code": "H2X 1A1",
+            "city": "Montréal", "province": "AB"}}})
+        payment_data = json.dumps({"credit_card": {"name": "John Doe", "number": "4242 4242 4242 4242",
+                                                   "expiration_year": 2030, "expiration_month": 9, "cvv": "123"}})
+        order_document = routes.order_document
+        concurrent = []
+
+        def document_after_concurrent_payment(order, *args, **kwargs):
+            if not concurrent:
+                concurrent.append(client.put(f'/order/{order_id}', data=payment_data,
+                                             content_type='application/json'))
+            return order_document(order, *args, **kwargs)
+
+        monkeypatch.setattr(routes, "order_document", document_after_concurrent_payment)
+        assert client.put(f'/order/{order_id}', data=shipping_data, content_type='application/json').status_code == 200
+        assert concurrent[0].status_code == 409
+        assert json.loads(concurrent[0].data)["errors"]["order"]["code"] == "update-in-progress"
+        assert Queue("payments", connection=routes.redis_client).job_ids == []
+
+        # Verrou libéré après l'écriture: le paiement part avec la nouvelle expédition
+        assert client.put(f'/order/{order_id}', data=payment_data, content_type='application/json').status_code == 202
+
+    def test_shipping_update_after_payment(self, client, test_db, create_complete_order, monkeypatch):
+        """Une commande payée depuis sa lecture n'est pas modifiée (mise à jour conditionnelle)"""
+        from api8inf349 import routes
+
+        stale = routes.load_order(create_complete_order.id)
+        Order.update(paid=True).where(Order.id == stale.id).execute()
+        monkeypatch.setattr(routes, "load_order", lambda order_id: stale)
+
+        response = client.put(f'/order/{stale.id}', data=json.dumps({"order": {
+            "email": "new@example.com", "shipping_information": {
+                "country": "Canada", "address": "2 rue", "postal_code": "H2X 1A1",
+                "city": "Montréal", "province": "AB"}}}), content_type='application/json')
+        assert response.status_code == 409
+        assert json.loads(response.data)["errors"]["order"]["code"] == "already-paid"
+        assert Order.get_by_id(stale.id).province == "QC"
+
+    def test_payment_charged_by_lock_owner_only(self, test_db, create_complete_order, redis_client):
+        """Le job qui ne détient pas la réservation n'appelle pas la passerelle"""
+        from api8inf349.idempotency import claim_payment
+        from api8inf349.tasks import charge_order
+
+        claim_payment(create_complete_order.id, "job-a")
+        result = charge_order("job-b", create_complete_order.id, {}, {}, "http://gateway.invalid/pay")
+
+        assert result["error"] == "payment-in-progress"
+        assert Order.get_by_id(create_complete_order.id).transaction_error is None
+
+    def test_job_events(self, client, test_db, monkeypatch):
+        """Flux SSE d'un job terminé, et repli sur la réponse de polling"""
+        from rq import Queue
+        from api8inf349 import routes
+        from api8inf349.config import Config
+        from api8inf349.events import stream_slots
+
+        job = Queue("payments", connection=routes.redis_client).enqueue(
+            "api8inf349.tasks.process_payment", 1, {}, {}, "")
+
+        response = client.get(f'/job/{job.id}/events')
+        assert response.mimetype == "application/json"
+        assert json.loads(response.data)["status"] == "queued"
+
+        job.set_status("finished")
+        response = client.get(f'/job/{job.id}/events', headers={"Accept": "text/event-stream"})
+        assert response.mimetype == "text/event-stream"
+        assert response.data.decode().startswith("event: finished\n")
+        response.close()
+        assert stream_slots.active == 0
+
+        # Limite de flux atteinte: réponse de polling
+        monkeypatch.setattr(Config, "SSE_MAX_STREAMS", 0)
+        response = client.get(f'/job/{job.id}/events', headers={"Accept": "text/event-stream"})
+        assert response.mimetype == "application/json"
+        assert json.loads(response.data)["status"] == "finished"
+
+    def test_conditional_requests(self, client, test_db):
+        """ETag / If-None-Match sur le catalogue et les commandes"""
+        response = client.get('/?limit=2')
+        etag = response.headers["ETag"]
+        assert "max-age" in response.headers["Cache-Control"]
+
+        response = client.get('/?limit=2', headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+
+        response = client.post('/order',
+                               data=json.dumps({"product": {"id": 1, "quantity": 1}}),
+                               content_type='application/json')
+        order_id = json.loads(response.data)["order_id"]
+
+        etag = client.get(f'/order/{order_id}').headers["ETag"]
+        assert client.get(f'/order/{order_id}', headers={"If-None-Match": etag}).status_code == 304
+
+        shipping_data = {"order": {"email": "etag@example.com", "shipping_information": {
+            "country": "Canada", "address": "1 rue", "postal_code": "G7H 1A1",
+            "city": "Chicoutimi", "province": "QC"}}}
+        client.put(f'/order/{order_id}', data=json.dumps(shipping_data), content_type='application/json')
+
+        response = client.get(f'/order/{order_id}', headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert json.loads(response.data)["order"]["email"] == "etag@example.com"
+
+    def test_gzip_responses(self, client, test_db, monkeypatch):
+        """Compression gzip selon Accept-Encoding, avec un ETag distinct"""
+        import gzip
+        from api8inf349.config import Config
+
+        plain = client.get('/?limit=100')
+        assert "Content-Encoding" not in plain.headers
+        assert "Accept-Encoding" in plain.headers["Vary"]
+
+        # Seuil abaissé à la taille du catalogue de test
+        monkeypatch.setattr(Config, "GZIP_MIN_SIZE", len(plain.data))
+
+        response = client.get('/?limit=100', headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(response.data) == plain.data
+        assert response.headers["ETag"] == plain.headers["ETag"][:-1] + '-gz"'
+
+        response = client.get('/?limit=100', headers={"Accept-Encoding": "gzip",
+                                                      "If-None-Match": response.headers["ETag"]})
+        assert response.status_code == 304
+
+        # Les petites réponses ne sont pas compressées
+        response = client.get('/?limit=1', headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+
+    def test_search_products(self, client, test_db):
+        """Recherche par mots (préfixe pour le dernier), filtres et tris"""
+        def ids(query):
+            response = client.get(f'/products/search?{query}')
+            assert response.status_code == 200
+            return [p["id"] for p in response.get_json()["products"]]
+
+        assert ids('q=egg') == [1, 3]  # nom avant description
+        assert ids('q=green+smoo') == [3]
+        assert ids('q=egg&in_stock=false') == [3]
+        assert ids('min_price=20&max_price=30') == [1, 2]
+        assert ids('sort=-price') == [2, 1, 3]
+        assert ids('sort=price&limit=1&page=2') == [1]
+        assert ids('q=banana') == []
+
+        response = client.get('/products/search?min_price=cheap&sort=popular')
+        assert response.status_code == 422
+        assert set(response.get_json()["errors"]) == {"min_price", "sort"}
+        for query in ('min_price=nan', 'max_price=inf', 'min_price=-Infinity'):
+            response = client.get(f'/products/search?{query}')
+            assert response.status_code == 422
+            assert response.get_json()["errors"][query.split("=")[0]]["code"] == "invalid-value"
+
+    def test_static_assets(self, client):
+        """Pages réécrites vers des URL versionnées, gzip précalculé et cache immuable"""
+        import gzip
+        import re
+
+        page = client.get('/frontend/index.html', headers={"Accept-Encoding": "gzip"})
+        assert page.headers["Content-Encoding"] == "gzip"
+        assert page.headers["Cache-Control"] == "no-cache"
+        script_url = re.search(r'src="(/frontend/script\.js\?v=\w+)"', gzip.decompress(page.data).decode()).group(1)
+
+        script = client.get(script_url, headers={"Accept-Encoding": "gzip"})
+        assert "immutable" in script.headers["Cache-Control"]
+        assert gzip.decompress(script.data) == client.get('/frontend/script.js').data
+
+        response = client.get(script_url, headers={"Accept-Encoding": "gzip", "If-None-Match": script.headers["ETag"]})
+        assert response.status_code == 304
+
+        image = client.get('/img/0.jpg')
+        assert image.mimetype == "image/jpeg"
+        assert image.data == client.get('/frontend/static/img/0.jpg').data
+        assert client.get('/frontend/../requirements.txt').status_code == 404
+
+    def test_image_added_after_startup(self, client, tmp_path, monkeypatch):
+        """Une image ajoutée après le démarrage est servie sans reconstruire le manifeste"""
+        import shutil
+        from api8inf349.assets import assets
+
+        monkeypatch.setattr(assets, "root", str(tmp_path))
+        monkeypatch.setattr(assets, "manifest", dict(assets.manifest))
+        (tmp_path / "static" / "img").mkdir(parents=True)
+        assert client.get('/img/new.jpg').status_code == 404
+
+        shutil.copy(assets.manifest["static/img/0.jpg"].filename, tmp_path / "static" / "img" / "new.jpg")
+        response = client.get('/img/new.jpg')
+        assert response.status_code == 200
+        assert response.mimetype == "image/jpeg"
+        assert "static/img/new.jpg" in assets.manifest
+
+    def test_image_derivatives(self, client, tmp_path, monkeypatch):
+        """Miniature générée une fois, puis servie depuis le cache disque"""
+        import io
+        Image = pytest.importorskip("PIL.Image")
+        from api8inf349.images import image_cache
+
+        monkeypatch.setattr(image_cache, "directory", str(tmp_path))
+        response = client.get('/img/0.jpg?w=120')
+        assert response.status_code == 200
+        assert Image.open(io.BytesIO(response.data)).width == 120
+        assert len(response.data) < len(client.get('/img/0.jpg').data)
+        assert len(list(tmp_path.rglob("*.jpg"))) == 1
+
+        again = client.get('/img/0.jpg?w=120', headers={"If-None-Match": response.headers["ETag"]})
+        assert again.status_code == 304
+        assert client.get('/img/0.jpg?w=121').status_code == 422
+
+    def test_metrics(self, client, test_db):
+        """/metrics expose les compteurs par route, le SQL par requête et les files RQ"""
+        series = 'http_requests_total{method="GET",route="/order/<int:order_id>",status="404"}'
+
+        def value(text, name):
+            # Compteurs globaux au processus: on compare avant/après
+            return next((float(line.split()[-1]) for line in text.splitlines() if line.startswith(name + " ")), 0)
+
+        before = value(client.get('/metrics').data.decode(), series)
+        client.get('/order/1234')
+        client.get('/order/1234')
+
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+
+        text = response.data.decode()
+        assert value(text, series) == before + 2
+        assert 'http_request_db_queries_count{route="/order/<int:order_id>"}' in text
+        assert 'rq_queue_depth{queue="payments"} 0' in text
+
+    def test_sql_profile_header(self, client, test_db, monkeypatch):
+        """En-tête X-DB: nombre de requêtes SQL et temps passé en base"""
+        from api8inf349.config import Config
+
+        monkeypatch.setattr(Config, "SQL_PROFILE_HEADER", True)
+        client.get('/')  # catalogue en mémoire déjà chargé
+        response = client.post('/order',
+                               data=json.dumps({"products": [{"id": 1}, {"id": 2}]}),
+                               content_type='application/json')
+
+        queries = response.headers["X-DB"].split(";")[0]
+        assert queries == "queries=2"
+
     def test_create_order_with_invalid_json(self, client, test_db):
         """Test de création d'une commande avec JSON invalide"""
         response = client.post('/order', 
@@ -1,6 +1,6 @@
 import pytest
 import json
-from app.models import Product, Order
+from api8inf349.models import Product, Order
 
 class TestEndToEndFlow(object):
     """Tests d'intégration pour le flux complet de commande"""
@@ -160,7 +160,7 @@ class TestEndToEndFlow(object):
 
     def test_fetch_products_integration(self, client, test_db, mock_requests_get):
         """Test d'intégration pour la récupération des produits depuis l'API externe"""
-        from app.database import fetch_products
+        from api8inf349.bootstrap import fetch_products
         
         # Vider d'abord la table des produits
         Product.delete().execute()
@@ -184,6 +184,39 @@ class TestEndToEndFlow(object):
         data = json.loads(response.data)
         assert len(data["products"]) == 3
     
+    def test_sync_products_incremental(self, client, test_db, monkeypatch):
+        """Test de la synchronisation incrémentale du catalogue (upsert + 304)"""
+        from api8inf349 import bootstrap
+        from conftest import MOCK_PRODUCTS, MockResponse
+
+        feed = [dict(p) for p in MOCK_PRODUCTS["products"]]
+        feed[0]["price"] = 30.0
+        feed.append({"id": 4, "name": "Oats", "description": "Oats flour", "image": "4.jpg",
+                     "weight": 50, "price": 5.0, "in_stock": True})
+        requests_headers = []
+
+        def fake_get(url, **kwargs):
+            requests_headers.append(kwargs.get("headers", {}))
+            if kwargs.get("headers", {}).get("If-None-Match") == '"v1"':
+                return MockResponse(None, 304)
+            response = MockResponse({"products": feed}, 200)
+            response.headers = {"ETag": '"v1"'}
+            return response
+
+        monkeypatch.setattr(bootstrap.gateway, "get", fake_get)
+
+        report = bootstrap.sync_products()
+        assert (report["inserted"], report["updated"], report["unchanged"]) == (1, 1, 2)
+        assert Product.get(Product.id == 1).price == 30.0
+        assert Product.select().count() == 4
+
+        report = bootstrap.sync_products()
+        assert report["status"] == "not-modified"
+        assert requests_headers[-1]["If-None-Match"] == '"v1"'
+
+        data = json.loads(client.get('/').data)
+        assert data["total"] == 4
+
     def test_payment_retry_after_failure(self, client, test_db, create_complete_order):
         """Test pour vérifier qu'une commande peut être payée après un échec initial"""
         order = create_complete_order
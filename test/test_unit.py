@@ -1,6 +1,6 @@
 import pytest
 import json
-from app.models import Product, Order
+from api8inf349.models import Product, Order
 
 class TestModels:
     """Tests unitaires pour les modèles de données"""
@@ -149,4 +149,366 @@ class TestModels:
                 shipping_price=p["expected_shipping"]
             )
             
-            assert order.shipping_price == p["expected_shipping"]
\ No newline at end of file
+            assert order.shipping_price == p["expected_shipping"]
+
+class TestPricing:
+    """Tests unitaires du calcul des prix"""
+
+    def test_shipping_price_brackets(self):
+        """Les bornes des tranches de poids sont inclusives"""
+        from api8inf349.pricing import shipping_price
+
+        assert [shipping_price(w) for w in (0, 500, 501, 2000, 2001)] == [5, 5, 10, 10, 25]
+
+class TestCatalog:
+    """Tests unitaires du catalogue en mémoire"""
+
+    def test_catalog_reload_on_version_bump(self, test_db):
+        """Le catalogue ne voit un nouveau produit qu'après un changement de version"""
+        from api8inf349.catalog import catalog, bump_catalog_version
+
+        catalog.clear()
+        assert len(catalog) == 3
+        assert catalog.get(1).name == "Brown eggs"
+
+        Product.create(id=4, name="Oats", description="Oats flour", price=5.0,
+                       weight=50, in_stock=True, image="4.jpg")
+        assert catalog.get(4) is None
+
+        bump_catalog_version()
+        assert catalog.get(4).price == 5.0
+        assert [p.id for p in catalog.after(2, 10)] == [3, 4]
+
+
+    def test_catalog_version_survives_redis_flush(self, test_db, redis_client):
+        """Après un Redis vidé, la version du catalogue (ETag) ne reprend pas une ancienne valeur"""
+        from api8inf349.catalog import CATALOG_VERSION_KEY, bump_catalog_version, read_catalog_version
+
+        before = bump_catalog_version()
+        redis_client.delete(CATALOG_VERSION_KEY)
+
+        after = read_catalog_version()
+        assert after not in (None, before)
+        assert read_catalog_version() == after  # même jeton pour tous les processus
+
+        redis_client.delete(CATALOG_VERSION_KEY)
+        assert bump_catalog_version() not in (before, after)
+
+class TestOrderLoader:
+    """Tests unitaires du chargement des commandes"""
+
+    def test_load_order_constant_queries(self, test_db, executed_sql):
+        """Le nombre de requêtes ne dépend pas du nombre de lignes"""
+        from api8inf349.models import OrderProduct
+        from api8inf349.orders import load_order
+
+        order = Order.create(total_price=0)
+        for product in Product.select():
+            OrderProduct.create(order=order, product=product, quantity=2)
+
+        executed_sql.clear()
+        snapshot = load_order(order.id)
+
+        assert len(executed_sql) == 2
+        assert [line.product_id for line in snapshot.lines] == [1, 2, 3]
+        assert snapshot.total_weight == (400 + 299 + 399) * 2
+
+    def test_backfilled_order_single_read(self, test_db, executed_sql):
+        """Après la migration, une commande se lit en une seule requête"""
+        from api8inf349.models import OrderProduct
+        from api8inf349.orders import load_order, backfill_order_aggregates, order_summaries
+
+        order = Order.create(total_price=0)
+        for product in Product.select():
+            OrderProduct.create(order=order, product=product, quantity=2)
+
+        assert backfill_order_aggregates(batch_size=10) == 1
+        assert backfill_order_aggregates(batch_size=10) == 0
+
+        executed_sql.clear()
+        snapshot = load_order(order.id)
+
+        assert len(executed_sql) == 1
+        assert [line.product_id for line in snapshot.lines] == [1, 2, 3]
+        assert snapshot.total_weight == (400 + 299 + 399) * 2
+        assert order_summaries()[0]["products_count"] == 3
+
+    def test_insert_orders_returning(self, test_db, executed_sql, monkeypatch):
+        """Avec RETURNING (PostgreSQL), un lot de commandes coûte deux INSERT"""
+        from api8inf349.orders import insert_orders, load_orders, validate_carts
+
+        monkeypatch.setattr(test_db, "returning_clause", True)
+        carts = [{"product": {"id": 1, "quantity": n}} for n in range(1, 6)]
+        carts.append({"products": [{"id": 1}, {"id": 3}]})
+        validated = validate_carts(carts)
+        assert validated[-1][1]["errors"]["products"]["code"] == "not-found"
+
+        executed_sql.clear()
+        order_ids = insert_orders([lines for lines, _ in validated[:-1]])
+
+        assert len([sql for sql in executed_sql if sql.startswith("INSERT")]) == 2
+        orders = load_orders(order_ids)
+        assert [orders[order_id].lines[0].quantity for order_id in order_ids] == [1, 2, 3, 4, 5]
+
+
+class TestOrderCache:
+    """Tests unitaires du cache des commandes"""
+
+    def test_waiter_stops_when_lock_released(self, test_db, redis_client):
+        """Sans document laissé par le processus qui charge, l'attente s'arrête à la libération du verrou"""
+        import threading
+        import time
+        from api8inf349.order_cache import order_cache, ORDER_LOCK_KEY
+
+        redis_client.set(ORDER_LOCK_KEY.format(9999), "other-process", px=2000)
+        threading.Timer(0.05, redis_client.delete, (ORDER_LOCK_KEY.format(9999),)).start()
+
+        start = time.monotonic()
+        assert order_cache.fetch(9999) is None
+        assert time.monotonic() - start < 1
+
+    def test_version_expires_with_document(self, test_db, redis_client, create_complete_order):
+        """La version (ETag fort) a le TTL du document écrit: elle ne décrit jamais un document reconstruit"""
+        from api8inf349.config import Config
+        from api8inf349.order_cache import order_cache, ORDER_KEY, ORDER_VERSION_KEY
+        from api8inf349.orders import load_order, order_document
+
+        order_id = create_complete_order.id
+        order_cache.store(order_id, order_document(load_order(order_id), credit_card={"name": "John Doe"}))
+        assert redis_client.ttl(ORDER_VERSION_KEY.format(order_id)) == Config.ORDER_CACHE_TTL
+        assert redis_client.ttl(ORDER_KEY.format(order_id)) == Config.ORDER_CACHE_TTL
+
+
+class TestDatabase:
+    """Tests unitaires de la gestion des connexions"""
+
+    def test_with_connection_scopes_job(self, test_db):
+        """Une tâche ouvre sa connexion et la rend à la fin"""
+        from api8inf349.database import database, with_connection
+
+        database.close()
+
+        @with_connection
+        def job():
+            return database.is_closed()
+
+        assert job() is False
+        assert database.is_closed()
+
+
+class TestGateway:
+    """Tests unitaires du client HTTP des services distants"""
+
+    class FakeResponse:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    def test_retries_transient_errors_only_when_idempotent(self, monkeypatch):
+        """Un GET est réessayé sur 503, un POST ne l'est pas"""
+        from api8inf349.gateway import GatewayClient
+
+        client = GatewayClient(max_retries=2, backoff=0)
+        statuses = [503, 503, 200]
+        calls = []
+
+        def fake_request(method, url, **kwargs):
+            calls.append((method, kwargs["timeout"]))
+            return self.FakeResponse(statuses[len(calls) - 1])
+
+        monkeypatch.setattr(client.session, "request", fake_request)
+
+        assert client.get("http://gateway/", name="products").status_code == 200
+        assert len(calls) == 3
+        assert calls[0][1] == (client.connect_timeout, client.read_timeout)
+        assert client.stats()["products"]["calls"] == 3
+
+        calls.clear()
+        statuses = [503]
+        assert client.post("http://gateway/", name="payment").status_code == 503
+        assert len(calls) == 1
+
+
+class TestSupervisor:
+    """Tests unitaires de la configuration des workers"""
+
+    def test_parse_pools(self):
+        """Groupes de files par priorité avec leur nombre de processus"""
+        from api8inf349.supervisor import parse_pools
+
+        assert parse_pools("payments,default:3; maintenance") == [
+            (["payments", "default"], 3),
+            (["maintenance"], 1)
+        ]
+        assert parse_pools("") == []
+
+
+class TestMetrics:
+    """Tests unitaires de l'export des métriques"""
+
+    def test_histogram_render(self):
+        """Les intervalles sont cumulés à l'export"""
+        from api8inf349.metrics import Histogram
+
+        histogram = Histogram("job_seconds", "Durée", ("outcome",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value, outcome="success")
+
+        lines = histogram.render()
+        assert 'job_seconds_bucket{outcome="success",le="0.1"} 1' in lines
+        assert 'job_seconds_bucket{outcome="success",le="1.0"} 3' in lines
+        assert 'job_seconds_bucket{outcome="success",le="+Inf"} 4' in lines
+        assert 'job_seconds_count{outcome="success"} 4' in lines
+
+    def test_worker_metrics_shared_in_redis(self, redis_client):
+        """Les métriques des workers sont cumulées dans Redis, lisibles par l'exporteur"""
+        from api8inf349.metrics import Counter, RedisStore
+
+        counter = Counter("payment_jobs_total", "Jobs", ("outcome",), store=RedisStore("metrics:test"))
+        counter.inc(outcome="success")
+        counter.inc(outcome="success")
+
+        other_process = Counter("payment_jobs_total", "Jobs", ("outcome",), store=RedisStore("metrics:test"))
+        assert 'payment_jobs_total{outcome="success"} 2.0' in other_process.render()
+
+    def test_api_metrics_aggregated_across_processes(self, redis_client, monkeypatch):
+        """Les métriques de l'API sont envoyées par lots dans Redis: chaque processus exporte le cumul"""
+        from api8inf349.config import Config
+        from api8inf349.metrics import Counter, BufferedRedisStore
+
+        monkeypatch.setattr(Config, "METRICS_FLUSH_INTERVAL", 60)
+        first = Counter("http_requests_total", "Requêtes", ("status",), store=BufferedRedisStore("metrics:test"))
+        second = Counter("http_requests_total", "Requêtes", ("status",), store=BufferedRedisStore("metrics:test"))
+        first.inc(status=200)
+        first.inc(status=200)
+        second.inc(status=200)
+        assert redis_client.hlen("metrics:test") == 1  # incréments suivants gardés en mémoire
+
+        first.render()  # chaque export envoie les incréments en attente du processus
+        assert 'http_requests_total{status="200"} 3.0' in second.render()
+
+
+class TestProfiler:
+    """Tests unitaires du profil SQL"""
+
+    def test_normalize_sql(self):
+        """Les listes IN de longueurs différentes donnent la même requête normalisée"""
+        from api8inf349.profiler import normalize_sql
+
+        assert normalize_sql('SELECT * FROM "product" WHERE "id" IN (%s, %s,\n %s)') == \
+            normalize_sql('SELECT * FROM "product" WHERE "id" IN (?, ?)')
+        assert normalize_sql('INSERT INTO "orderproduct" ("order_id", "quantity") VALUES (?, ?), (?, ?),\n (?, ?)') == \
+            'INSERT INTO "orderproduct" ("order_id", "quantity") VALUES (?...), ...'
+
+    def test_lazy_loads_detected(self, test_db, create_test_order, monkeypatch):
+        """Un chargement paresseux dans une boucle est signalé comme N+1"""
+        from api8inf349.config import Config
+        from api8inf349.models import OrderProduct
+        from api8inf349.profiler import start_profile, stop_profile, check_n_plus_one, NPlusOneError
+
+        for product in Product.select():
+            OrderProduct.create(order=create_test_order, product=product, quantity=1)
+
+        profile = start_profile("test", keep_queries=True)
+        try:
+            lines = list(OrderProduct.select().where(OrderProduct.order == create_test_order))
+            names = [line.product.name for line in lines]  # une requête par ligne
+        finally:
+            stop_profile()
+
+        assert len(names) == 4
+        assert profile.count == 5
+        monkeypatch.setattr(Config, "N_PLUS_ONE_THRESHOLD", 3)
+        with pytest.raises(NPlusOneError):
+            check_n_plus_one(profile, "raise")
+
+
+class TestServer:
+    """Tests unitaires du serveur de production"""
+
+    def test_server_options(self):
+        """Les options de la ligne de commande remplacent celles de l'environnement"""
+        from api8inf349.config import Config
+        from api8inf349.server import server_options
+
+        options = server_options(bind=None, workers=2, threads=1)
+        assert options["bind"] == Config.SERVER_BIND
+        assert options["workers"] == 2
+        assert options["worker_class"] == "sync"
+        assert options["preload_app"] is True
+
+    def test_serve_ignores_flask_debug(self, monkeypatch):
+        """`flask serve` ne lance jamais l'application en mode debug"""
+        from flask.cli import ScriptInfo
+        from api8inf349 import app, server
+        from api8inf349.commands import serve_command
+
+        monkeypatch.setattr(server, "Server", object)
+        monkeypatch.setattr(server, "serve", lambda served, **options: served.debug)
+        monkeypatch.setattr(app, "debug", False)
+        monkeypatch.setenv("FLASK_DEBUG", "true")
+        result = app.test_cli_runner().invoke(serve_command, obj=ScriptInfo(create_app=lambda: app))
+
+        assert result.exit_code == 0
+        assert app.debug is False
+
+    def test_reinit_after_fork(self, tmp_path):
+        """Après un fork, l'enfant n'utilise aucune connexion héritée du parent"""
+        from playhouse.pool import PooledSqliteDatabase
+        from api8inf349.database import database
+        from api8inf349.server import reinit_after_fork
+
+        previous = database.obj
+        pool = PooledSqliteDatabase(str(tmp_path / "pool.db"))
+        database.initialize(pool)
+        try:
+            database.connect()
+            inherited = database.connection()
+            reinit_after_fork()
+
+            assert database.is_closed()
+            assert pool._in_use == {} and pool._connections == []
+            assert database.connection() is not inherited
+        finally:
+            database.close()
+            database.initialize(previous)
+
+
+    def test_warm_up_adds_order_columns(self, test_db):
+        """Au démarrage, une base créée avant les agrégats reçoit les colonnes manquantes"""
+        from api8inf349 import app
+        from api8inf349.server import warm_up
+
+        test_db.execute_sql('ALTER TABLE "order" DROP COLUMN "lines_summary"')
+        test_db.execute_sql('ALTER TABLE "order" DROP COLUMN "total_weight"')
+        warm_up(app)
+
+        columns = {column.name for column in test_db.get_columns("order")}
+        assert {"item_count", "total_weight", "lines_summary"} <= columns
+        assert Order.create(total_price=1.0, lines_summary="[]").lines_summary == "[]"
+
+class TestImageCache:
+    """Tests unitaires du cache des dérivés d'images"""
+
+    def test_prune_least_recently_served(self, tmp_path):
+        """Au-delà du budget, les dérivés les moins récemment servis sont supprimés"""
+        import os
+        from api8inf349.images import ImageCache
+
+        cache = ImageCache(str(tmp_path), max_bytes=250)
+        for index, name in enumerate(("old", "recent", "new")):
+            path = tmp_path / f"{name}.jpg"
+            path.write_bytes(b"x" * 100)
+            os.utime(path, (index, index))
+
+        cache._added(0)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["new.jpg", "recent.jpg"]
+
+
+class TestSearch:
+    """Tests unitaires de l'index de recherche"""
+
+    def test_tokenize_accents(self):
+        """Les accents et la casse sont ignorés"""
+        from api8inf349.search import tokenize
+
+        assert tokenize("Œufs BRUNS, très-frais") == ["oeufs", "bruns", "tres", "frais"]
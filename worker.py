@@ -1,8 +1,5 @@
-from rq import Queue, Connection, SimpleWorker
-from api8inf349.redis_client import redis_client
+from api8inf349.supervisor import main
 
 if __name__ == "__main__":
-    with Connection(redis_client):
-        queue = Queue()
-        worker = SimpleWorker([queue])
-        worker.work()
+    # Démarre les processus worker décrits par WORKER_POOLS (voir config.py)
+    main()